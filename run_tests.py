@@ -10,7 +10,7 @@ import sys
 from pathlib import Path
 
 
-def run_tests(test_type="all", verbose=True, coverage=False, parallel=False):
+def run_tests(test_type="all", verbose=True, coverage=False, parallel=False, quick=False):
     """
     Run tests with the specified configuration.
 
@@ -19,6 +19,7 @@ def run_tests(test_type="all", verbose=True, coverage=False, parallel=False):
         verbose: Whether to run tests in verbose mode
         coverage: Whether to run with coverage reporting
         parallel: Whether to run tests in parallel
+        quick: Whether to skip tests marked slow
     """
     # Base pytest command
     cmd = ["python", "-m", "pytest"]
@@ -34,15 +35,19 @@ def run_tests(test_type="all", verbose=True, coverage=False, parallel=False):
     if coverage:
         cmd.extend(["--cov=sprite_processor", "--cov-report=html", "--cov-report=term"])
 
-    # Add parallel execution if requested
+    # Add parallel execution if requested. loadfile keeps every test module on a
+    # single worker so session-scoped fixtures (e.g. api_client) are built once per file.
     if parallel:
-        cmd.extend(["-n", "auto"])
+        cmd.extend(["-n", "auto", "--dist=loadfile"])
 
-    # Filter tests by type
+    # Filter tests by type (marker expressions are combined, since pytest keeps only one -m)
+    markers = []
+    if quick:
+        markers.append("not slow")
     if test_type == "unit":
-        cmd.extend(["-m", "unit"])
+        markers.append("unit")
     elif test_type == "integration":
-        cmd.extend(["-m", "integration"])
+        markers.append("integration")
     elif test_type == "api":
         cmd.append("tests/test_api.py")
     elif test_type == "core":
@@ -58,6 +63,8 @@ def run_tests(test_type="all", verbose=True, coverage=False, parallel=False):
     elif test_type != "all":
         print(f"Unknown test type: {test_type}")
         return False
+    if markers:
+        cmd.extend(["-m", " and ".join(markers)])
 
     # Run the tests
     print(f"Running tests: {' '.join(cmd)}")
@@ -87,16 +94,12 @@ def main():
 
     args = parser.parse_args()
 
-    # Add quick test filter if requested
-    if args.quick:
-        # This would be handled by pytest markers
-        pass
-
     success = run_tests(
         test_type=args.type,
         verbose=not args.no_verbose,
         coverage=args.coverage,
         parallel=args.parallel,
+        quick=args.quick,
     )
 
     if success:
@@ -3,6 +3,7 @@ __all__ = [
     "remove_file",
     "video_to_gif",
     "video_to_spritesheet",
+    "produce_outputs",
     "analyze_video",
     "process_video_pipeline",
     "process_video_pipeline_all_models",
@@ -37,4 +38,4 @@ def remove_file(in_path: str, model_name: str = "isnet-general-use") -> bytes:
 
 # Import video and pipeline modules
 from .pipeline import process_video_pipeline, process_video_pipeline_all_models
-from .video import analyze_video, video_to_gif, video_to_spritesheet
+from .video import analyze_video, produce_outputs, video_to_gif, video_to_spritesheet
@@ -5,11 +5,13 @@ import math
 import os
 import tempfile
 import time
+from collections.abc import Callable
 from pathlib import Path
 
 import uvicorn
 from fastapi import (
     BackgroundTasks,
+    Depends,
     FastAPI,
     File,
     Form,
@@ -76,21 +78,17 @@ api.add_middleware(
 def health():
     return {"ok": True}
 
-@api.post("/analyze-spritesheet")
-async def analyze_spritesheet(file: UploadFile = File(...)):
+
+def _detect_spritesheet_grid(img: Image.Image) -> dict:
     """
     Detect sprites on alpha or white background, infer (cols x rows), tile size,
     and return per-frame boxes. Robust to big gutters and non-uniform padding.
-    """
-    if not file:
-        raise HTTPException(status_code=400, detail="No file uploaded")
 
-    import io, math, tempfile
-    from pathlib import Path
-    from typing import List, Tuple, Dict, Any, Optional
+    Expects an RGBA image; raises HTTPException(422) when nothing usable is found.
+    """
+    from typing import List, Tuple, Dict
 
     import numpy as np
-    from PIL import Image
 
     MIN_BLOB_AREA = 32 * 32      # ignore tiny specks
     MIN_TILE = 16
@@ -100,17 +98,6 @@ async def analyze_spritesheet(file: UploadFile = File(...)):
     ROW_JOIN_FACTOR = 0.7        # how tightly to group centers vertically
     COL_JOIN_FACTOR = 0.7        # ditto horizontally
 
-    tmp_file_path: Optional[str] = None
-    img: Optional[Image.Image] = None
-
-    def cleanup():
-        try:
-            if img: img.close()
-        except: pass
-        try:
-            if tmp_file_path: Path(tmp_file_path).unlink(missing_ok=True)
-        except: pass
-
     # ---- tiny helpers --------------------------------------------------------
     def to_mask_rgba(a: np.ndarray, rgb: np.ndarray) -> np.ndarray:
         """
@@ -201,6 +188,161 @@ async def analyze_spritesheet(file: UploadFile = File(...)):
         return groups
 
     # --------------------------------------------------------------------------
+    W,H = img.size
+    arr = np.array(img)
+    a = arr[...,3]
+    rgb = arr[...,:3]
+
+    # Build mask & crop to content
+    mask = to_mask_rgba(a, rgb)
+    ys, xs = np.where(mask > 0)
+    if len(xs) == 0:
+        raise HTTPException(status_code=422, detail="No foreground detected.")
+    left, right = int(xs.min()), int(xs.max())+1
+    top, bottom = int(ys.min()), int(ys.max())+1
+    core_mask = mask[top:bottom, left:right]
+    CW, CH = core_mask.shape[1], core_mask.shape[0]
+
+    boxes = find_components(core_mask)
+    # shift boxes to full-image coords
+    boxes = [(x+left, y+top, w, h) for (x,y,w,h) in boxes]
+
+    if not boxes:
+        raise HTTPException(status_code=422, detail="No sprites detected.")
+
+    # Centers & basic stats
+    centers = [(x + w/2.0, y + h/2.0) for (x,y,w,h) in boxes]
+    widths  = [w for (_,_,w,_) in boxes]
+    heights = [h for (_,_,_,h) in boxes]
+    med_w   = float(np.median(widths))
+    med_h   = float(np.median(heights))
+
+    # Guardrails
+    if med_w < MIN_TILE or med_h < MIN_TILE:
+        # if very small blobs, it’s probably noise
+        boxes = [b for b in boxes if b[2] >= MIN_TILE and b[3] >= MIN_TILE]
+        if not boxes:
+            raise HTTPException(status_code=422, detail="Detected tiles are too small.")
+
+    # ---- Group into rows by y-center proximity
+    ys_sorted = sorted([c[1] for c in centers])
+    row_thresh = max(4.0, ROW_JOIN_FACTOR * med_h)
+    row_groups_y = group_sorted(ys_sorted, row_thresh)
+
+    # Assign row index to each box by nearest row center
+    row_centers = [float(np.mean(g)) for g in row_groups_y]
+    def nearest_row_idx(yc: float) -> int:
+        return int(np.argmin([abs(yc - rc) for rc in row_centers]))
+
+    per_row: Dict[int, List[Tuple[float, Tuple[int,int,int,int]]]] = {}
+    for (c, b) in zip(centers, boxes):
+        r = nearest_row_idx(c[1])
+        per_row.setdefault(r, []).append((c[0], b))
+
+    # Sort each row by x and compute columns
+    col_counts = []
+    col_steps  = []
+    normalized_rows: List[List[Tuple[int,int,int,int]]] = []
+    for r in sorted(per_row.keys()):
+        row = sorted(per_row[r], key=lambda t: t[0])
+        normalized_rows.append([t[1] for t in row])
+        # x gaps between neighbors (tile pitch)
+        xs = [t[0] for t in row]
+        if len(xs) >= 2:
+            steps = [xs[i+1]-xs[i] for i in range(len(xs)-1)]
+            col_steps.extend(steps)
+        col_counts.append(len(row))
+
+    # Estimate rows/cols using medians across rows
+    rows = len(per_row)
+    cols = int(np.median(col_counts)) if col_counts else len(normalized_rows[0])
+
+    # If rows*cols differs from detected blob count a lot, try regrouping cols more loosely
+    if rows * cols < len(boxes) * 0.7:
+        # Loosen horizontal threshold and regroup
+        xs_all = sorted([c[0] for c in centers])
+        col_thresh = max(4.0, COL_JOIN_FACTOR * med_w)
+        col_groups_x = group_sorted(xs_all, col_thresh)
+        cols = max(cols, int(round(np.median([len(g) for g in col_groups_x]))))
+
+    # Tile pitch estimation (distance between cell centers)
+    pitch_x = float(np.median(col_steps)) if col_steps else med_w * 1.2
+    # Vertical pitch: distance between row centers
+    row_centers_sorted = sorted(row_centers)
+    row_gaps = [row_centers_sorted[i+1]-row_centers_sorted[i] for i in range(len(row_centers_sorted)-1)]
+    pitch_y = float(np.median(row_gaps)) if row_gaps else med_h * 1.2
+
+    # Tile size: use median bbox size; you can expand to pitch if you expect fixed cells
+    tile_w = int(round(max(med_w, MIN_TILE)))
+    tile_h = int(round(max(med_h, MIN_TILE)))
+
+    # Clamp and sanity-check
+    total = rows * cols
+    if total > MAX_FRAMES:
+        scale = math.sqrt(total / MAX_FRAMES)
+        rows = max(1, int(round(rows / scale)))
+        cols = max(1, int(round(cols / scale)))
+        total = rows * cols
+
+    # Confidence: how regular the grid is (low spread in sizes and pitches, and fill ratio)
+    size_spread = (np.std(widths)/ (np.mean(widths)+1e-6) + np.std(heights)/(np.mean(heights)+1e-6)) * 0.5
+    pitch_spread = (np.std(col_steps)/(np.mean(col_steps)+1e-6) if col_steps else 0.5) \
+                   + (np.std(row_gaps)/(np.mean(row_gaps)+1e-6) if row_gaps else 0.5)
+    size_term = max(0.0, 1.0 - min(1.0, size_spread))
+    pitch_term = max(0.0, 1.0 - min(1.0, pitch_spread))
+    fill_term = min(1.0, len(boxes) / max(1, rows*cols))
+    confidence = round(0.15 + 0.45*size_term + 0.25*pitch_term + 0.15*fill_term, 3)
+
+    # Per-frame boxes (sorted row-major by y then x)
+    out_boxes = []
+    for r in sorted(per_row.keys()):
+        row = sorted(per_row[r], key=lambda t: t[0])
+        out_boxes.extend([tuple(map(int, b)) for (_, b) in row])
+
+    result = {
+        "spritesheet_size": f"{W}x{H}",
+        "best_guess": {
+            "grid": f"{cols}x{rows}",
+            "frame_size": f"{tile_w}x{tile_h}",
+            "total_frames": int(rows*cols),
+            "detected_sprites": len(boxes),
+            "confidence": float(min(1.0, max(0.0, confidence))),
+        },
+        "diagnostics": {
+            "content_crop": {"x": int(left), "y": int(top), "w": int(CW), "h": int(CH)},
+            "median_bbox": {"w": tile_w, "h": tile_h},
+            "median_pitch": {"x": int(round(pitch_x)), "y": int(round(pitch_y))},
+            "rows_detected": rows,
+            "cols_detected": cols,
+        },
+        # For preview/cropping; each: [x,y,w,h] in original image coords
+        "boxes_row_major": out_boxes[:MAX_FRAMES],
+    }
+    return result
+
+
+@api.post("/analyze-spritesheet")
+async def analyze_spritesheet(file: UploadFile = File(...)):
+    """
+    Detect sprites on alpha or white background, infer (cols x rows), tile size,
+    and return per-frame boxes. Robust to big gutters and non-uniform padding.
+    """
+    if not file:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    from typing import Optional
+
+    tmp_file_path: Optional[str] = None
+    img: Optional[Image.Image] = None
+
+    def cleanup():
+        try:
+            if img: img.close()
+        except: pass
+        try:
+            if tmp_file_path: Path(tmp_file_path).unlink(missing_ok=True)
+        except: pass
+
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
             data = await file.read()
@@ -208,137 +350,7 @@ async def analyze_spritesheet(file: UploadFile = File(...)):
             tmp_file_path = tmp.name
 
         img = Image.open(tmp_file_path).convert("RGBA")
-        W,H = img.size
-        arr = np.array(img)
-        a = arr[...,3]
-        rgb = arr[...,:3]
-
-        # Build mask & crop to content
-        mask = to_mask_rgba(a, rgb)
-        ys, xs = np.where(mask > 0)
-        if len(xs) == 0:
-            cleanup(); raise HTTPException(status_code=422, detail="No foreground detected.")
-        left, right = int(xs.min()), int(xs.max())+1
-        top, bottom = int(ys.min()), int(ys.max())+1
-        core_mask = mask[top:bottom, left:right]
-        CW, CH = core_mask.shape[1], core_mask.shape[0]
-
-        boxes = find_components(core_mask)
-        # shift boxes to full-image coords
-        boxes = [(x+left, y+top, w, h) for (x,y,w,h) in boxes]
-
-        if not boxes:
-            cleanup(); raise HTTPException(status_code=422, detail="No sprites detected.")
-
-        # Centers & basic stats
-        centers = [(x + w/2.0, y + h/2.0) for (x,y,w,h) in boxes]
-        widths  = [w for (_,_,w,_) in boxes]
-        heights = [h for (_,_,_,h) in boxes]
-        med_w   = float(np.median(widths))
-        med_h   = float(np.median(heights))
-
-        # Guardrails
-        if med_w < MIN_TILE or med_h < MIN_TILE:
-            # if very small blobs, it’s probably noise
-            boxes = [b for b in boxes if b[2] >= MIN_TILE and b[3] >= MIN_TILE]
-            if not boxes:
-                cleanup(); raise HTTPException(status_code=422, detail="Detected tiles are too small.")
-
-        # ---- Group into rows by y-center proximity
-        ys_sorted = sorted([c[1] for c in centers])
-        row_thresh = max(4.0, ROW_JOIN_FACTOR * med_h)
-        row_groups_y = group_sorted(ys_sorted, row_thresh)
-
-        # Assign row index to each box by nearest row center
-        row_centers = [float(np.mean(g)) for g in row_groups_y]
-        def nearest_row_idx(yc: float) -> int:
-            return int(np.argmin([abs(yc - rc) for rc in row_centers]))
-
-        per_row: Dict[int, List[Tuple[float, Tuple[int,int,int,int]]]] = {}
-        for (c, b) in zip(centers, boxes):
-            r = nearest_row_idx(c[1])
-            per_row.setdefault(r, []).append((c[0], b))
-
-        # Sort each row by x and compute columns
-        col_counts = []
-        col_steps  = []
-        normalized_rows: List[List[Tuple[int,int,int,int]]] = []
-        for r in sorted(per_row.keys()):
-            row = sorted(per_row[r], key=lambda t: t[0])
-            normalized_rows.append([t[1] for t in row])
-            # x gaps between neighbors (tile pitch)
-            xs = [t[0] for t in row]
-            if len(xs) >= 2:
-                steps = [xs[i+1]-xs[i] for i in range(len(xs)-1)]
-                col_steps.extend(steps)
-            col_counts.append(len(row))
-
-        # Estimate rows/cols using medians across rows
-        rows = len(per_row)
-        cols = int(np.median(col_counts)) if col_counts else len(normalized_rows[0])
-
-        # If rows*cols differs from detected blob count a lot, try regrouping cols more loosely
-        if rows * cols < len(boxes) * 0.7:
-            # Loosen horizontal threshold and regroup
-            xs_all = sorted([c[0] for c in centers])
-            col_thresh = max(4.0, COL_JOIN_FACTOR * med_w)
-            col_groups_x = group_sorted(xs_all, col_thresh)
-            cols = max(cols, int(round(np.median([len(g) for g in col_groups_x]))))
-
-        # Tile pitch estimation (distance between cell centers)
-        pitch_x = float(np.median(col_steps)) if col_steps else med_w * 1.2
-        # Vertical pitch: distance between row centers
-        row_centers_sorted = sorted(row_centers)
-        row_gaps = [row_centers_sorted[i+1]-row_centers_sorted[i] for i in range(len(row_centers_sorted)-1)]
-        pitch_y = float(np.median(row_gaps)) if row_gaps else med_h * 1.2
-
-        # Tile size: use median bbox size; you can expand to pitch if you expect fixed cells
-        tile_w = int(round(max(med_w, MIN_TILE)))
-        tile_h = int(round(max(med_h, MIN_TILE)))
-
-        # Clamp and sanity-check
-        total = rows * cols
-        if total > MAX_FRAMES:
-            scale = math.sqrt(total / MAX_FRAMES)
-            rows = max(1, int(round(rows / scale)))
-            cols = max(1, int(round(cols / scale)))
-            total = rows * cols
-
-        # Confidence: how regular the grid is (low spread in sizes and pitches, and fill ratio)
-        size_spread = (np.std(widths)/ (np.mean(widths)+1e-6) + np.std(heights)/(np.mean(heights)+1e-6)) * 0.5
-        pitch_spread = (np.std(col_steps)/(np.mean(col_steps)+1e-6) if col_steps else 0.5) \
-                       + (np.std(row_gaps)/(np.mean(row_gaps)+1e-6) if row_gaps else 0.5)
-        size_term = max(0.0, 1.0 - min(1.0, size_spread))
-        pitch_term = max(0.0, 1.0 - min(1.0, pitch_spread))
-        fill_term = min(1.0, len(boxes) / max(1, rows*cols))
-        confidence = round(0.15 + 0.45*size_term + 0.25*pitch_term + 0.15*fill_term, 3)
-
-        # Per-frame boxes (sorted row-major by y then x)
-        out_boxes = []
-        for r in sorted(per_row.keys()):
-            row = sorted(per_row[r], key=lambda t: t[0])
-            out_boxes.extend([tuple(map(int, b)) for (_, b) in row])
-
-        result = {
-            "spritesheet_size": f"{W}x{H}",
-            "best_guess": {
-                "grid": f"{cols}x{rows}",
-                "frame_size": f"{tile_w}x{tile_h}",
-                "total_frames": int(rows*cols),
-                "detected_sprites": len(boxes),
-                "confidence": float(min(1.0, max(0.0, confidence))),
-            },
-            "diagnostics": {
-                "content_crop": {"x": int(left), "y": int(top), "w": int(CW), "h": int(CH)},
-                "median_bbox": {"w": tile_w, "h": tile_h},
-                "median_pitch": {"x": int(round(pitch_x)), "y": int(round(pitch_y))},
-                "rows_detected": rows,
-                "cols_detected": cols,
-            },
-            # For preview/cropping; each: [x,y,w,h] in original image coords
-            "boxes_row_major": out_boxes[:MAX_FRAMES],
-        }
-        return result
+        return _detect_spritesheet_grid(img)
 
     except HTTPException:
         cleanup(); raise
@@ -348,17 +360,26 @@ async def analyze_spritesheet(file: UploadFile = File(...)):
         cleanup()
 
 
+def get_remover() -> Callable[..., bytes]:
+    """
+    Dependency providing the background remover used by the /remove endpoints.
+    Tests swap it through api.dependency_overrides instead of patching the module.
+    """
+    return remove_bytes
+
+
 @api.post("/remove")
 async def remove_endpoint(
     file: UploadFile = File(...),
     filename: str | None = None,
     model: str = Form("isnet-general-use"),
+    remover: Callable[..., bytes] = Depends(get_remover),
 ):
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     data = await file.read()
     try:
-        cut = remove_bytes(data, model_name=model)
+        cut = remover(data, model_name=model)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     # Return as PNG with alpha
@@ -368,7 +389,10 @@ async def remove_endpoint(
 
 
 @api.post("/remove-all-models")
-async def remove_all_models_endpoint(file: UploadFile = File(...)):
+async def remove_all_models_endpoint(
+    file: UploadFile = File(...),
+    remover: Callable[..., bytes] = Depends(get_remover),
+):
     """Process image with all available models and return results"""
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
@@ -387,7 +411,7 @@ async def remove_all_models_endpoint(file: UploadFile = File(...)):
 
     for model in models:
         try:
-            processed_data = remove_bytes(data, model_name=model)
+            processed_data = remover(data, model_name=model)
             # Convert to base64 for JSON response
             import base64
 
@@ -1,8 +1,13 @@
+import struct
 import sys
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO
 
 import click
+import numpy as np
 from PIL import Image
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
@@ -138,37 +143,141 @@ class _WatchHandler(FileSystemEventHandler):
                 print(f"[watch] Skip exists: {out}")
 
 
-def _create_spritesheet(frames: list[Image.Image], cols: int, rows: int, output_path: Path) -> Path:
+def _tile_frame_array(frames: np.ndarray, cols: int, rows: int) -> np.ndarray:
+    """
+    Lay out an ``(N, H, W, C)`` frame array row-major on a ``rows`` x ``cols`` grid.
+
+    The sheet is allocated as ``(rows, H, cols, W, C)`` so each grid row is filled by
+    one strided copy of ``cols`` frames, and the final ``(rows*H, cols*W, C)`` image
+    is a reshape of that buffer rather than another copy. Frames past the grid are
+    dropped; unused cells stay zeroed (transparent for RGBA frames).
+    """
+    count = min(len(frames), cols * rows)
+    frame_height, frame_width, channels = frames.shape[1:]
+    sheet = np.zeros((rows, frame_height, cols, frame_width, channels), dtype=np.uint8)
+
+    full_rows, remainder = divmod(count, cols)
+    sheet[:full_rows] = (
+        frames[: full_rows * cols]
+        .reshape(full_rows, cols, frame_height, frame_width, channels)
+        .swapaxes(1, 2)
+    )
+    if remainder:
+        sheet[full_rows, :, :remainder] = frames[full_rows * cols : count].swapaxes(0, 1)
+
+    return sheet.reshape(rows * frame_height, cols * frame_width, channels)
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    """Frame ``data`` as a PNG chunk (length, tag, data, CRC)."""
+    crc = zlib.crc32(data, zlib.crc32(tag))
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+
+def _save_png_parallel(
+    image: np.ndarray, output_path: Path | BinaryIO, max_workers: int, compress_level: int = 6
+) -> None:
+    """
+    Encode an ``(H, W, 3|4)`` uint8 image as PNG, deflating horizontal strips in parallel.
+
+    Rows get the PNG "Sub" filter in one vectorized pass; each strip is then
+    raw-deflated on a worker thread (zlib releases the GIL) and ended with a sync
+    flush, so the strips concatenate into a single valid IDAT stream.
+    """
+    height, width, channels = image.shape
+    flat = image.reshape(height, width * channels)
+
+    # Filter byte 1 ("Sub") + each byte minus the same channel of the pixel to its left
+    rows = np.empty((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 0] = 1
+    rows[:, 1 : 1 + channels] = flat[:, :channels]
+    np.subtract(flat[:, channels:], flat[:, :-channels], out=rows[:, 1 + channels :])
+
+    strips = np.array_split(rows, min(max_workers, height))
+
+    def deflate(strip: np.ndarray, last: bool) -> bytes:
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(strip) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(
+            executor.map(deflate, strips, [i == len(strips) - 1 for i in range(len(strips))])
+        )
+
+    # zlib wrapper around the concatenated raw deflate streams
+    idat = b"\x78\x9c" + b"".join(parts) + struct.pack(">I", zlib.adler32(rows))
+    color_type = 6 if channels == 4 else 2
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    png = (
+        _PNG_SIGNATURE
+        + _png_chunk(b"IHDR", ihdr)
+        + _png_chunk(b"IDAT", idat)
+        + _png_chunk(b"IEND", b"")
+    )
+
+    if isinstance(output_path, (str, Path)):
+        Path(output_path).write_bytes(png)
+    else:
+        output_path.write(png)
+
+
+def _save_spritesheet(
+    spritesheet: np.ndarray, output_path: Path | BinaryIO, max_workers: int
+) -> None:
+    """Write the assembled sheet as PNG, in parallel strips when ``max_workers > 1``."""
+    if max_workers > 1:
+        _save_png_parallel(spritesheet, output_path, max_workers)
+    else:
+        Image.fromarray(spritesheet).save(output_path, "PNG")
+
+
+def _create_spritesheet(
+    frames: list[Image.Image] | np.ndarray,
+    cols: int,
+    rows: int,
+    output_path: Path | BinaryIO,
+    max_workers: int = 1,
+) -> Path | BinaryIO:
     """
     Create a spritesheet from a list of PIL Images.
 
     Args:
-        frames: List of PIL Images to arrange in the spritesheet
+        frames: List of PIL Images to arrange in the spritesheet, or an ``(N, H, W, C)``
+            uint8 RGB/RGBA array of frames (as returned by ``extract_gif_frames_array``)
         cols: Number of columns in the grid
         rows: Number of rows in the grid
-        output_path: Path where the spritesheet will be saved
+        output_path: Path where the spritesheet will be saved, or a writable binary
+            stream (e.g. ``io.BytesIO``) to keep the PNG in memory
+        max_workers: Threads used to compress the PNG; above 1 the sheet is deflated
+            in parallel horizontal strips instead of by PIL's single-threaded encoder
 
     Returns:
-        Path to the created spritesheet
+        The ``output_path`` the spritesheet was written to
     """
-    if not frames:
+    if len(frames) == 0:
         raise ValueError("No frames provided for spritesheet creation")
 
+    if isinstance(frames, np.ndarray):
+        # PNG cells are 8-bit; refuse float/wide frames instead of silently wrapping them
+        if frames.dtype != np.uint8:
+            raise ValueError(f"Frame array must be uint8, got {frames.dtype}")
+        spritesheet = _tile_frame_array(frames, cols, rows)
+        _save_spritesheet(spritesheet, output_path, max_workers)
+        return output_path
+
     # Get frame dimensions from the first frame
     frame_width, frame_height = frames[0].size
 
-    # Calculate spritesheet dimensions
-    spritesheet_width = cols * frame_width
-    spritesheet_height = rows * frame_height
-
-    # Create the spritesheet canvas
-    spritesheet = Image.new("RGBA", (spritesheet_width, spritesheet_height), (0, 0, 0, 0))
-
-    # Place frames in the spritesheet
-    for i, frame in enumerate(frames):
-        if i >= cols * rows:
-            break  # Don't exceed the grid size
+    # Assemble into one RGBA buffer; each cell is a single slice copy
+    spritesheet = np.zeros((rows * frame_height, cols * frame_width, 4), dtype=np.uint8)
 
+    # Place frames in the spritesheet, without exceeding the grid size
+    for i, frame in enumerate(frames[: cols * rows]):
         row = i // cols
         col = i % cols
 
@@ -179,10 +288,10 @@ def _create_spritesheet(frames: list[Image.Image], cols: int, rows: int, output_
         if frame.size != (frame_width, frame_height):
             frame = frame.resize((frame_width, frame_height), Image.Resampling.LANCZOS)
 
-        spritesheet.paste(frame, (x, y))
+        spritesheet[y : y + frame_height, x : x + frame_width] = np.asarray(frame.convert("RGBA"))
 
     # Save the spritesheet
-    spritesheet.save(output_path, "PNG")
+    _save_spritesheet(spritesheet, output_path, max_workers)
     return output_path
 
 
@@ -4,35 +4,122 @@ Pipeline module for sprite-processor.
 Handles end-to-end workflows: Video → GIF → Spritesheet → Background Removal
 """
 
+import json
 import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Final
 
-from .video import analyze_video, extract_gif_frames, video_to_gif
+from rembg import new_session, remove
+
+from .video import analyze_video, extract_gif_frames_array, video_to_gif
 
 logger = logging.getLogger(__name__)
 
+# Available models, in the order process_video_pipeline_all_models runs and reports them
+ALL_MODELS: Final[tuple[str, ...]] = (
+    "isnet-general-use",
+    "u2net_human_seg",
+    "u2net",
+    "u2netp",
+    "u2net_cloth_seg",
+    "silueta",
+)
+
+# rembg sessions keyed by model name; loading a model's ONNX weights is the expensive part
+_SESSION_CACHE: dict[str, Any] = {}
+# One lock per model so concurrent lookups load each model once without serializing
+# the loads of different models; _SESSION_LOCKS_GUARD protects the lock table itself
+_SESSION_LOCKS: dict[str, threading.Lock] = {}
+_SESSION_LOCKS_GUARD = threading.Lock()
+
+
+def _get_session(model_name: str) -> Any:
+    """Return the rembg session for ``model_name``, creating it on first use."""
+    session = _SESSION_CACHE.get(model_name)
+    if session is not None:
+        return session
+
+    with _SESSION_LOCKS_GUARD:
+        lock = _SESSION_LOCKS.setdefault(model_name, threading.Lock())
+    with lock:
+        session = _SESSION_CACHE.get(model_name)
+        if session is None:
+            session = _SESSION_CACHE[model_name] = new_session(model_name)
+    return session
+
+
+def clear_model_cache(models: Iterable[str] | None = None) -> None:
+    """Drop cached rembg sessions (all, or just ``models``) so their models can be freed."""
+    if models is None:
+        _SESSION_CACHE.clear()
+        return
+    for model_name in models:
+        _SESSION_CACHE.pop(model_name, None)
+
+
+def _process_one_cached(image_bytes: bytes, session: Any, out_path: Path) -> Path:
+    """Remove the background from already-read image bytes with a preloaded session."""
+    if out_path.exists():
+        raise FileExistsError(f"Output exists (use --overwrite): {out_path}")
+    out_path.write_bytes(remove(image_bytes, session=session))
+    return out_path
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    """Write ``data`` as JSON to ``path`` via a temp file so readers never see a partial file."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates the file 0600; give it the umask-based mode a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_name, 0o666 & ~umask)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
 
+
+@dataclass(frozen=True, slots=True)
 class VideoPipelineConfig:
-    """Configuration for video processing pipeline."""
-
-    def __init__(
-        self,
-        fps: int = 10,
-        duration: float | None = None,
-        grid: str = "5x2",
-        frames: int | None = None,
-        model: str = "isnet-general-use",
-        max_width: int = 480,
-        max_height: int = 480,
-    ):
-        self.fps = fps
-        self.duration = duration
-        self.grid = grid
-        self.frames = frames
-        self.model = model
-        self.max_width = max_width
-        self.max_height = max_height
+    """Configuration for video processing pipeline.
+
+    Frozen so configs are hashable and can key the pipeline result cache.
+    """
+
+    fps: int = 10
+    duration: float | None = None
+    grid: str = "5x2"
+    frames: int | None = None
+    model: str = "isnet-general-use"
+    max_width: int = 480
+    max_height: int = 480
+    # Models run concurrently in the all-models pipeline; None picks min(models, CPUs)
+    max_workers: int | None = None
+    # Free the rembg sessions the all-models pipeline loaded once it finishes, trading
+    # slower repeat runs for not keeping every model's weights resident
+    release_models: bool = False
+
+
+# Results of use_cache runs keyed by (video, modification time, size, output dir, config,
+# keep_intermediates), least recently used first and capped at _PIPELINE_CACHE_SIZE
+_PIPELINE_CACHE_SIZE: Final = 64
+_PIPELINE_CACHE: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+_PIPELINE_CACHE_LOCK = threading.Lock()
+
+
+def clear_pipeline_cache() -> None:
+    """Forget every result cached by ``process_video_pipeline(..., use_cache=True)``."""
+    with _PIPELINE_CACHE_LOCK:
+        _PIPELINE_CACHE.clear()
 
 
 def process_video_pipeline(
@@ -40,6 +127,7 @@ def process_video_pipeline(
     output_dir: Path | str,
     config: VideoPipelineConfig,
     keep_intermediates: bool = False,
+    use_cache: bool = False,
 ) -> dict[str, Any]:
     """
     Complete pipeline: Video → GIF → Spritesheet → Background Removal
@@ -49,12 +137,43 @@ def process_video_pipeline(
         output_dir: Directory for output files
         config: Pipeline configuration
         keep_intermediates: Whether to keep intermediate files
+        use_cache: Reuse the result of an earlier identical run (same video file and
+            modification time, output directory and config) instead of reprocessing
 
     Returns:
         Dictionary with paths to all generated files
     """
     video_path = Path(video_path)
     output_dir = Path(output_dir)
+
+    if use_cache:
+        # Absolute paths so relative/absolute spellings (or a chdir) can't split or alias
+        # entries; mtime and size make an edited video miss instead of hitting stale data
+        stat = video_path.stat()
+        key = (
+            os.path.abspath(video_path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            os.path.abspath(output_dir),
+            config,
+            keep_intermediates,
+        )
+        with _PIPELINE_CACHE_LOCK:
+            cached = _PIPELINE_CACHE.get(key)
+            if cached is not None:
+                _PIPELINE_CACHE.move_to_end(key)
+        # Also rerun if the output was removed since the cached run; that replaces only
+        # this key's entry, leaving every other cached run intact
+        if cached is None or not cached["processed_path"].exists():
+            cached = process_video_pipeline(video_path, output_dir, config, keep_intermediates)
+            with _PIPELINE_CACHE_LOCK:
+                _PIPELINE_CACHE[key] = cached
+                _PIPELINE_CACHE.move_to_end(key)
+                while len(_PIPELINE_CACHE) > _PIPELINE_CACHE_SIZE:
+                    _PIPELINE_CACHE.popitem(last=False)
+        # Copy so callers can't mutate the cached entry
+        return {**cached, "intermediate_files": list(cached["intermediate_files"])}
+
     logger.info(f"🚀 Starting video pipeline: {video_path.name}")
 
     # Ensure output directory exists
@@ -98,7 +217,7 @@ def process_video_pipeline(
             raise ValueError(f"Invalid grid format: {config.grid}. Use format like '5x2'")
 
         # Extract frames from GIF
-        frames = extract_gif_frames(gif_path, max_frames=config.frames)
+        frames = extract_gif_frames_array(gif_path, max_frames=config.frames)
 
         # Create spritesheet
         from .cli import _create_spritesheet
@@ -156,15 +275,7 @@ def process_video_pipeline_all_models(
     output_dir = Path(output_dir)
     logger.info(f"🚀 Starting video pipeline (all models): {video_path.name}")
 
-    # Available models
-    models = [
-        "isnet-general-use",
-        "u2net_human_seg",
-        "u2net",
-        "u2netp",
-        "u2net_cloth_seg",
-        "silueta",
-    ]
+    models = ALL_MODELS
 
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -173,11 +284,13 @@ def process_video_pipeline_all_models(
     base_name = video_path.stem
     gif_path = output_dir / f"{base_name}.gif"
     spritesheet_path = output_dir / f"{base_name}_spritesheet.png"
+    manifest_path = output_dir / f"{base_name}_results.json"
 
     results = {
         "video_path": video_path,
         "gif_path": None,
         "spritesheet_path": None,
+        "manifest_path": None,
         "model_results": {},
         "intermediate_files": [],
     }
@@ -206,7 +319,7 @@ def process_video_pipeline_all_models(
             raise ValueError(f"Invalid grid format: {config.grid}. Use format like '5x2'")
 
         # Extract frames from GIF
-        frames = extract_gif_frames(gif_path, max_frames=config.frames)
+        frames = extract_gif_frames_array(gif_path, max_frames=config.frames)
 
         # Create spritesheet
         from .cli import _create_spritesheet
@@ -218,26 +331,52 @@ def process_video_pipeline_all_models(
         # Step 3: Background Removal with All Models
         logger.info("🎨 Step 3: Processing with all models...")
 
-        for i, model in enumerate(models, 1):
-            logger.info(f"   🔄 Processing with model {i}/{len(models)}: {model}")
-
-            try:
-                from .cli import _process_one
-
-                processed_path = output_dir / f"{base_name}_{model}_processed.png"
-                _process_one(spritesheet_path, processed_path, model_name=model)
-
-                results["model_results"][model] = {
-                    "path": processed_path,
-                    "success": True,
-                    "size": processed_path.stat().st_size,
-                }
-
-                logger.info(f"   ✅ {model} completed successfully")
-
-            except Exception as e:
-                logger.error(f"   ❌ {model} failed: {e}")
-                results["model_results"][model] = {"path": None, "success": False, "error": str(e)}
+        # Every model works on the same spritesheet, so read it once
+        sheet_bytes = spritesheet_path.read_bytes()
+        # Sessions already loaded (by earlier or concurrent runs) are never released here
+        preloaded = set(_SESSION_CACHE)
+
+        def _run_model(model: str) -> Path:
+            processed_path = output_dir / f"{base_name}_{model}_processed.png"
+            return _process_one_cached(sheet_bytes, _get_session(model), processed_path)
+
+        # Each model is independent inference on the same spritesheet, and onnxruntime
+        # releases the GIL while it runs, so a thread pool overlaps them.
+        max_workers = config.max_workers or min(len(models), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for i, model in enumerate(models, 1):
+                logger.info(f"   🔄 Processing with model {i}/{len(models)}: {model}")
+                futures[model] = executor.submit(_run_model, model)
+
+            # Collect in submission order so model_results keeps the models' order
+            for model, future in futures.items():
+                try:
+                    processed_path = future.result()
+
+                    results["model_results"][model] = {
+                        "path": processed_path,
+                        "success": True,
+                        "size": processed_path.stat().st_size,
+                    }
+
+                    logger.info(f"   ✅ {model} completed successfully")
+
+                except Exception as e:
+                    logger.error(f"   ❌ {model} failed: {e}")
+                    results["model_results"][model] = {
+                        "path": None,
+                        "success": False,
+                        "error": str(e),
+                    }
+
+        if config.release_models:
+            clear_model_cache(model for model in models if model not in preloaded)
+
+        # Record every model's outcome in one manifest, replaced atomically so a
+        # reader sees either the previous run's manifest or this one, never a mix
+        _write_json_atomic(manifest_path, results["model_results"])
+        results["manifest_path"] = manifest_path
 
         # Clean up intermediate files if requested
         if not keep_intermediates:
@@ -5,22 +5,33 @@ Handles video to GIF conversion, frame extraction, and video analysis.
 """
 
 import logging
-import tempfile
+import math
+import os
+from collections.abc import Iterator
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Literal
 
 try:
-    # VideoFileClip is in moviepy.editor
+    import cv2
     import imageio  # noqa: F401  # required transitively by moviepy for GIF/ffmpeg
-    from moviepy.editor import VideoFileClip  # type: ignore
+    import numpy as np
+
+    # VideoFileClip is in moviepy.editor
+    from moviepy.editor import ImageSequenceClip, VideoFileClip  # type: ignore
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos  # type: ignore
     from PIL import Image
 except ImportError as e:
     raise ImportError(
         "Video processing dependencies not installed. "
-        "Run: pip install moviepy imageio[ffmpeg] pillow"
+        "Run: pip install moviepy imageio[ffmpeg] pillow opencv-python"
     ) from e
 
 logger = logging.getLogger(__name__)
 
+# yuv420p keeps MP4 previews playable in browsers; it needs even frame dimensions
+_MP4_FFMPEG_PARAMS = ("-pix_fmt", "yuv420p", "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2")
+
 
 def _ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -34,6 +45,164 @@ def _constrain_size(w: int, h: int, max_w: int, max_h: int) -> tuple[int, int]:
     return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
 
 
+def _select_frame_indices(
+    total_frames: int,
+    max_frames: int | None = None,
+    frame_interval: int = 1,
+    *,
+    sample_evenly: bool = False,
+) -> list[int]:
+    """Pick which of ``total_frames`` frames to keep, in ascending order."""
+    if sample_evenly and max_frames and max_frames > 0:
+        if max_frames >= total_frames:
+            return list(range(0, total_frames, frame_interval))
+        # Evenly spaced indices across [0, total_frames-1]
+        evenly = [
+            int(round(k * (total_frames - 1) / max(1, (max_frames - 1)))) for k in range(max_frames)
+        ]
+        return sorted(set(i for i in evenly if i % frame_interval == 0)) or [0]
+
+    indices = list(range(0, total_frames, frame_interval))
+    if max_frames is not None and max_frames > 0:
+        indices = indices[:max_frames]
+    return indices
+
+
+def _prepare_clip(clip, duration: float | None, max_width: int, max_height: int):
+    """Trim ``clip`` to ``duration`` and shrink it to fit ``max_width`` x ``max_height``."""
+    # Version-proof trim: use set_end()/with_duration
+    if duration is not None and 0 < duration < float(clip.duration or 0.0):
+        if hasattr(clip, "set_end"):
+            clip = clip.set_end(duration)
+        elif hasattr(clip, "with_duration"):
+            clip = clip.with_duration(duration)
+        logger.info(f"   Trimmed to: {duration:.2f}s")
+
+    nw, nh = _constrain_size(clip.w, clip.h, max_width, max_height)
+    if (nw, nh) != (clip.w, clip.h):
+        clip = clip.resize(newsize=(nw, nh))
+        logger.info(f"   Resized to: {nw}x{nh}")
+    return clip
+
+
+def _decode_frame_slots(
+    cap: "cv2.VideoCapture", wanted: list[int], size: tuple[int, int]
+) -> tuple[np.ndarray, dict[int, int]]:
+    """
+    Decode the ascending, unique source frame numbers ``wanted`` in one sequential pass.
+
+    Skipped frames are only grab()bed (demuxed and decoded, never converted or
+    copied out); wanted ones are retrieve()d, area-resized to ``size`` and
+    converted to opaque RGBA straight into one preallocated ``(N, H, W, 4)`` uint8
+    array (spritesheets stay RGBA, like the GIF-frame path).
+    Reading stops after the last wanted frame or at the end of the stream.
+
+    Returns the frames actually read and a map from frame number to its slot.
+    """
+    width, height = size
+    frames = np.empty((len(wanted), height, width, 4), dtype=np.uint8)
+    scaled = np.empty((height, width, 3), dtype=np.uint8)
+    slots: dict[int, int] = {}
+    position = 0
+    for number in wanted:
+        while position <= number:
+            if not cap.grab():
+                break
+            position += 1
+        else:
+            ok, bgr = cap.retrieve()
+            if ok:
+                if bgr.shape[:2] != (height, width):
+                    bgr = cv2.resize(bgr, size, dst=scaled, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(bgr, cv2.COLOR_BGR2RGBA, dst=frames[len(slots)])
+                slots[number] = len(slots)
+            continue
+        break  # end of stream
+    return frames[: len(slots)], slots
+
+
+def _take_frames(frames: np.ndarray, slots: dict[int, int], frame_numbers: list[int]) -> np.ndarray:
+    """Pick ``frame_numbers`` (repeats allowed, unread ones dropped) out of decoded slots."""
+    order = [slots[n] for n in frame_numbers if n in slots]
+    # Reorder/repeat only when the caller asked for something other than the read order
+    if order == list(range(len(frames))):
+        return frames
+    return frames[order]
+
+
+def _read_frames_at(
+    cap: "cv2.VideoCapture", frame_numbers: list[int], size: tuple[int, int]
+) -> np.ndarray:
+    """Read the source frames at ``frame_numbers`` from ``cap``, in that order (repeats allowed)."""
+    frames, slots = _decode_frame_slots(cap, sorted(set(frame_numbers)), size)
+    return _take_frames(frames, slots, frame_numbers)
+
+
+def _parse_grid(grid: str) -> tuple[int, int]:
+    """Parse a ``"colsxrows"`` grid spec like ``"5x2"``."""
+    try:
+        cols, rows = map(int, grid.lower().split("x"))
+        if cols <= 0 or rows <= 0:
+            raise ValueError
+    except Exception:
+        raise ValueError(f"Invalid grid format: {grid}. Use format like '5x2'")
+    return cols, rows
+
+
+def _probe_duration(video_path: Path, source_fps: float) -> float:
+    """Length of ``video_path`` in seconds when OpenCV can't report its frame count."""
+    try:
+        duration = float(ffmpeg_parse_infos(str(video_path)).get("duration") or 0.0)
+    except Exception:
+        duration = 0.0
+    if math.isfinite(duration) and duration > 0:
+        return duration
+
+    # No usable container duration either: count the frames with a grab-only pass
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        frame_count = 0
+        while cap.grab():
+            frame_count += 1
+    finally:
+        cap.release()
+    if frame_count == 0:
+        raise ValueError(f"Could not determine the length of video: {video_path}")
+    return frame_count / source_fps
+
+
+def _probe_capture(
+    cap: "cv2.VideoCapture", video_path: Path, fallback_fps: float, duration: float | None
+) -> tuple[float, float, tuple[int, int]]:
+    """Return ``(source_fps, clip_duration, (width, height))`` for an opened capture."""
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    source_fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0) or float(fallback_fps)
+    source_frames = float(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    if math.isfinite(source_frames) and source_frames > 0:
+        clip_duration = source_frames / source_fps
+    else:
+        # Streamed containers (e.g. WebM muxed to a pipe) may not record a frame count
+        clip_duration = _probe_duration(video_path, source_fps)
+    if duration is not None and 0 < duration < clip_duration:
+        clip_duration = duration
+        logger.info(f"   Trimmed to: {duration:.2f}s")
+    return source_fps, clip_duration, (width, height)
+
+
+def _fill_grid(frames: np.ndarray, needed: int) -> np.ndarray:
+    """Pad (by repeating the last frame's index) or trim ``frames`` to ``needed`` cells."""
+    if 0 < len(frames) < needed:
+        return frames[np.minimum(np.arange(needed), len(frames) - 1)]
+    if len(frames) > needed:
+        return frames[:needed]
+    return frames
+
+
 # ---------- Disk-extract variant (RENAMED to avoid collision) ----------
 def extract_gif_frames_to_dir(
     gif_path: Path, output_dir: Path, max_frames: int | None = None
@@ -53,20 +222,14 @@ def extract_gif_frames_to_dir(
 
     frame_paths: list[Path] = []
     try:
-        with Image.open(gif_path) as gif:
-            total_frames = int(getattr(gif, "n_frames", 1)) or 1
-            logger.info(f"   GIF info: {gif.size}, {total_frames} frames")
-
-            frame_count = 0
-            for frame_index in range(total_frames):
-                if max_frames is not None and frame_count >= max_frames:
-                    break
-                gif.seek(frame_index)
-                frame = gif.convert("RGBA")
-                frame_path = output_dir / f"frame_{frame_index:03d}.png"
-                frame.save(frame_path, "PNG")
-                frame_paths.append(frame_path)
-                frame_count += 1
+        # Stream: each frame is decoded, written and dropped before the next is read
+        for frame_index, frame in enumerate(iter_gif_frames(gif_path, max_frames)):
+            # iter_gif_frames reads max_frames <= 0 as "no limit"; here it means no frames
+            if max_frames is not None and frame_index >= max_frames:
+                break
+            frame_path = output_dir / f"frame_{frame_index:03d}.png"
+            frame.save(frame_path, "PNG")
+            frame_paths.append(frame_path)
 
         logger.info(f"   ✅ Extracted {len(frame_paths)} frames to {output_dir}")
         return frame_paths
@@ -104,32 +267,72 @@ def extract_gif_frames(
         max_frames = int(max_frames)
 
     try:
-        frames: list[Image.Image] = []
+        frames = list(
+            iter_gif_frames(gif_path, max_frames, frame_interval, sample_evenly=sample_evenly)
+        )
+
+        logger.info(f"   ✅ Extracted {len(frames)} frames (in-memory)")
+        return frames
+
+    except Exception as e:
+        logger.error(f"❌ Frame extraction failed: {e}")
+        raise ValueError(f"Failed to extract frames: {e}") from e
+
+
+def iter_gif_frames(
+    gif_path: Path,
+    max_frames: int | None = None,
+    frame_interval: int = 1,
+    *,
+    sample_evenly: bool = False,
+) -> Iterator[Image.Image]:
+    """
+    Lazily yield the selected frames of a GIF as RGBA PIL Images.
+
+    Frames are decoded one at a time as the caller iterates, so only the
+    frames the caller keeps stay in memory. The GIF stays open until the
+    generator is exhausted or closed. Frame selection matches extract_gif_frames.
+    """
+    with Image.open(gif_path) as img:
+        total_frames = int(getattr(img, "n_frames", 1)) or 1
+        logger.info(f"   GIF has {total_frames} frames")
+
+        indices = _select_frame_indices(
+            total_frames, max_frames, frame_interval, sample_evenly=sample_evenly
+        )
+        for frame_idx in indices:
+            img.seek(frame_idx)
+            # convert() already returns a new image detached from the GIF's frame buffer
+            yield img.convert("RGBA")
+
+
+def extract_gif_frames_array(gif_path: Path, max_frames: int | None = None) -> np.ndarray:
+    """
+    Extract the first frames of a GIF into one preallocated ``(N, H, W, 4)`` uint8 array.
+
+    Each frame is decoded straight into its slot of a single contiguous RGBA buffer
+    instead of being kept as a separate PIL Image, so the spritesheet can be tiled
+    with slice copies.
+    """
+    logger.info(f"🖼️ Extracting frames from GIF into array: {gif_path.name}")
+
+    if not gif_path.exists():
+        raise FileNotFoundError(f"GIF file not found: {gif_path}")
+
+    try:
         with Image.open(gif_path) as img:
             total_frames = int(getattr(img, "n_frames", 1)) or 1
-            logger.info(f"   GIF has {total_frames} frames")
-
-            if sample_evenly and max_frames and max_frames > 0:
-                if max_frames >= total_frames:
-                    indices = list(range(0, total_frames, frame_interval))
-                else:
-                    # Evenly spaced indices across [0, total_frames-1]
-                    evenly = [
-                        int(round(k * (total_frames - 1) / max(1, (max_frames - 1))))
-                        for k in range(max_frames)
-                    ]
-                    indices = sorted(set(i for i in evenly if i % frame_interval == 0)) or [0]
-            else:
-                indices = list(range(0, total_frames, frame_interval))
-                if max_frames is not None and max_frames > 0:
-                    indices = indices[:max_frames]
+            count = total_frames
+            if max_frames is not None and max_frames > 0:
+                count = min(total_frames, max_frames)
 
-            for i, frame_idx in enumerate(indices, start=1):
-                img.seek(frame_idx)
-                frame = img.convert("RGBA").copy()
-                frames.append(frame)
+            width, height = img.size
+            frames = np.empty((count, height, width, 4), dtype=np.uint8)
+            for i in range(count):
+                img.seek(i)
+                frames[i] = np.asarray(img.convert("RGBA"))
 
-        logger.info(f"   ✅ Extracted {len(frames)} frames (in-memory)")
+        logger.info(f"   ✅ Extracted {count} frames (array)")
         return frames
 
     except Exception as e:
@@ -144,11 +347,21 @@ def video_to_gif(
     duration: float | None = None,
     max_width: int = 480,
     max_height: int = 480,
+    output_format: Literal["gif", "mp4"] = "gif",
 ) -> Path:
-    """Convert video to GIF with custom settings."""
+    """
+    Convert video to GIF with custom settings.
+
+    With output_format="mp4" the same trimmed/resized clip is encoded with libx264
+    (yuv420p) instead, which is much smaller and faster to write than a
+    256-color LZW GIF when the result is only for previewing.
+    """
     video_path = Path(video_path)
     output_path = Path(output_path)
-    logger.info(f"🎬 Converting video to GIF: {video_path.name}")
+    logger.info(f"🎬 Converting video to {output_format.upper()}: {video_path.name}")
+
+    if output_format not in ("gif", "mp4"):
+        raise ValueError(f"Unsupported output format: {output_format}. Use 'gif' or 'mp4'")
 
     if not video_path.exists():
         raise FileNotFoundError(f"Video file not found: {video_path}")
@@ -156,32 +369,43 @@ def video_to_gif(
     _ensure_parent_dir(output_path)
 
     try:
-        with VideoFileClip(str(video_path)) as clip:
+        # Probe the frame size up front so ffmpeg's area scaler shrinks frames while
+        # decoding, instead of resizing every full-resolution frame in Python afterwards.
+        # VideoFileClip re-probes the file itself and can't take these infos, but the
+        # probe is ~10 ms next to the seconds the decode-time scaling saves
+        ow, oh = ffmpeg_parse_infos(str(video_path)).get("video_size") or (0, 0)
+        nw, nh = _constrain_size(ow, oh, max_width, max_height)
+        clip_kwargs: dict[str, Any] = {}
+        if (nw, nh) != (ow, oh):
+            clip_kwargs = {"target_resolution": (nh, nw), "resize_algorithm": "area"}
+            logger.info(f"   Decoding at: {nw}x{nh}")
+
+        # Frames only: audio=False keeps moviepy from starting an audio decoder too
+        with VideoFileClip(str(video_path), audio=False, **clip_kwargs) as clip:
             original_duration = float(clip.duration or 0.0)
             original_fps = float(clip.fps or 0.0)
-            ow, oh = clip.size
             logger.info(f"   Original: {ow}x{oh}, {original_fps:.1f}fps, {original_duration:.2f}s")
 
-            # Version-proof trim: use set_end()/with_duration
-            if duration is not None and 0 < duration < original_duration:
-                if hasattr(clip, "set_end"):
-                    clip = clip.set_end(duration)
-                elif hasattr(clip, "with_duration"):
-                    clip = clip.with_duration(duration)
-                logger.info(f"   Trimmed to: {duration:.2f}s")
-
-            # FIXED INDENT: resize should not be nested inside the trim block
-            nw, nh = _constrain_size(clip.w, clip.h, max_width, max_height)
-            if (nw, nh) != (clip.w, clip.h):
-                clip = clip.resize(newsize=(nw, nh))
-                logger.info(f"   Resized to: {nw}x{nh}")
-
-            # Write GIF
-            logger.info(f"   Writing GIF with {fps} FPS via ffmpeg...")
-            clip.write_gif(str(output_path), fps=fps, program="ffmpeg")
+            clip = _prepare_clip(clip, duration, max_width, max_height)
+
+            if output_format == "mp4":
+                logger.info(f"   Writing MP4 with {fps} FPS via libx264...")
+                clip.write_videofile(
+                    str(output_path),
+                    fps=fps,
+                    codec="libx264",
+                    audio=False,
+                    preset="veryfast",
+                    ffmpeg_params=list(_MP4_FFMPEG_PARAMS),
+                    logger=None,
+                )
+            else:
+                # Write GIF
+                logger.info(f"   Writing GIF with {fps} FPS via ffmpeg...")
+                clip.write_gif(str(output_path), fps=fps, program="ffmpeg")
 
             output_size = output_path.stat().st_size
-            logger.info(f"   ✅ GIF created: {output_size / 1024:.1f} KB")
+            logger.info(f"   ✅ {output_format.upper()} created: {output_size / 1024:.1f} KB")
             return output_path
 
     except Exception as e:
@@ -189,8 +413,43 @@ def video_to_gif(
         raise ValueError(f"Failed to convert video: {e}") from e
 
 
+@lru_cache(maxsize=128)
+def _analyze_video_cached(
+    video_path: str, mtime_ns: int, file_size: int, target_fps: int
+) -> dict[str, Any]:
+    """Probe and analyze a video; ``mtime_ns`` and ``file_size`` key out stale entries."""
+    # Only container metadata is needed, so read ffmpeg's stream info directly
+    # instead of opening a VideoFileClip (which also starts a frame reader)
+    infos = ffmpeg_parse_infos(video_path)
+    duration = float(infos.get("duration") or 0.0)
+    fps = float(infos.get("video_fps") or 0.0)
+    size = tuple(infos.get("video_size") or (0, 0))
+
+    recommended_fps = min(target_fps, max(5, int(round(max(1.0, fps) / 2))))
+    recommended_duration = min(5.0, duration)
+    recommended_frames = int(round(recommended_duration * recommended_fps))
+
+    logger.info(
+        f"   Recommended: {recommended_fps} FPS, {recommended_duration:.2f}s, "
+        f"{recommended_frames} frames"
+    )
+    return {
+        "duration": duration,
+        "fps": recommended_fps,
+        "width": size[0],
+        "height": size[1],
+        "frames": recommended_frames,
+        "file_size": file_size,
+    }
+
+
 def analyze_video(video_path: Path | str, target_fps: int = 10) -> dict:
-    """Analyze video properties for processing recommendations."""
+    """
+    Analyze video properties for processing recommendations.
+
+    Results are memoized per file, keyed on its absolute path, modification time and
+    size, so analyzing the same unchanged video again does not re-probe it.
+    """
     video_path = Path(video_path)
     logger.info(f"🔍 Analyzing video: {video_path.name}")
 
@@ -198,29 +457,12 @@ def analyze_video(video_path: Path | str, target_fps: int = 10) -> dict:
         raise FileNotFoundError(f"Video file not found: {video_path}")
 
     try:
-        with VideoFileClip(str(video_path)) as clip:
-            duration = float(clip.duration or 0.0)
-            fps = float(clip.fps or 0.0)
-            size = tuple(clip.size)
-            total_frames = int(round(duration * fps)) if fps > 0 else 0
-
-            recommended_fps = min(target_fps, max(5, int(round(max(1.0, fps) / 2))))
-            recommended_duration = min(5.0, duration)
-            recommended_frames = int(round(recommended_duration * recommended_fps))
-
-            analysis = {
-                "duration": duration,
-                "fps": recommended_fps,
-                "width": size[0],
-                "height": size[1],
-                "frames": recommended_frames,
-                "file_size": video_path.stat().st_size,
-            }
-
-            logger.info(
-                f"   Recommended: {recommended_fps} FPS, {recommended_duration:.2f}s, {recommended_frames} frames"
-            )
-            return analysis
+        st = video_path.stat()
+        analysis = _analyze_video_cached(
+            os.path.abspath(video_path), st.st_mtime_ns, st.st_size, target_fps
+        )
+        # Hand out a copy so callers can't mutate the cached entry
+        return dict(analysis)
 
     except Exception as e:
         logger.error(f"❌ Video analysis failed: {e}")
@@ -249,46 +491,36 @@ def video_to_spritesheet(
     output_path = Path(output_path)
     logger.info(f"🎬 Converting video to spritesheet: {video_path.name}")
 
-    # Parse grid
-    try:
-        cols, rows = map(int, grid.lower().split("x"))
-        if cols <= 0 or rows <= 0:
-            raise ValueError
-    except Exception:
-        raise ValueError(f"Invalid grid format: {grid}. Use format like '5x2'")
+    cols, rows = _parse_grid(grid)
 
     target_frames = frames if (frames and frames > 0) else cols * rows
 
-    # Create temporary GIF first
-    with tempfile.NamedTemporaryFile(suffix=".gif", delete=False) as temp_gif:
-        temp_gif_path = Path(temp_gif.name)
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path}")
 
     try:
-        # Convert video to GIF (respect max size so frames match spritesheet cell bounds better)
-        video_to_gif(
-            video_path,
-            temp_gif_path,
-            fps=fps,
-            duration=duration,
-            max_width=max_width,
-            max_height=max_height,
-        )
+        # Decode the video once, sequentially, sampling the frames the grid needs
+        # (even sampling across the whole clip is usually best for sprites)
+        cap = cv2.VideoCapture(str(video_path))
+        try:
+            source_fps, clip_duration, (width, height) = _probe_capture(
+                cap, video_path, fps, duration
+            )
 
-        # Extract frames from GIF (even sampling across the whole clip is usually best for sprites)
-        extracted_frames = extract_gif_frames(
-            temp_gif_path,
-            max_frames=target_frames,
-            frame_interval=1,
-            sample_evenly=sample_evenly,
-        )
+            # Sample at the requested fps, then map each sample to its source frame
+            total_frames = max(1, int(clip_duration * fps))
+            indices = _select_frame_indices(
+                total_frames, target_frames, sample_evenly=sample_evenly
+            )
+            frame_numbers = [int(i * source_fps / fps + 1e-5) for i in indices]
+            size = _constrain_size(width, height, max_width, max_height)
+            extracted_frames = _read_frames_at(cap, frame_numbers, size)
+        finally:
+            cap.release()
+        logger.info(f"   ✅ Extracted {len(extracted_frames)} frames from {total_frames}")
 
-        # Pad/trim to grid size
-        needed = cols * rows
-        if len(extracted_frames) < needed and extracted_frames:
-            last = extracted_frames[-1]
-            extracted_frames.extend([last.copy() for _ in range(needed - len(extracted_frames))])
-        elif len(extracted_frames) > needed:
-            extracted_frames = extracted_frames[:needed]
+        # Pad (by repeating the last frame's index) / trim to grid size
+        extracted_frames = _fill_grid(extracted_frames, cols * rows)
 
         # Create spritesheet from frames
         from .cli import (
@@ -301,10 +533,95 @@ def video_to_spritesheet(
         logger.info(f"   ✅ Spritesheet created: {spritesheet_path}")
         return spritesheet_path
 
-    finally:
-        # Clean up temporary GIF
+    except Exception as e:
+        logger.error(f"❌ Spritesheet creation failed: {e}")
+        raise ValueError(f"Failed to create spritesheet: {e}") from e
+
+
+def produce_outputs(
+    video_path: Path | str,
+    gif_path: Path | str,
+    spritesheet_path: Path | str,
+    *,
+    gif_fps: int = 10,
+    sheet_fps: int = 10,
+    grid: str = "5x2",
+    frames: int | None = None,
+    duration: float | None = None,
+    max_width: int = 480,
+    max_height: int = 480,
+    sample_evenly: bool = True,
+) -> dict[str, Path]:
+    """
+    Write both a GIF and a spritesheet from a single decode of ``video_path``.
+
+    Frames are sampled on a shared timeline at ``lcm(gif_fps, sheet_fps)``: the GIF
+    takes every ``lcm/gif_fps``-th tick and the spritesheet picks its cells from every
+    ``lcm/sheet_fps``-th tick (as ``video_to_spritesheet`` would). Only the source
+    frames either output needs are decoded, once, into one shared array.
+
+    Returns:
+        ``{"gif_path": ..., "spritesheet_path": ...}``
+    """
+    video_path = Path(video_path)
+    gif_path = Path(gif_path)
+    spritesheet_path = Path(spritesheet_path)
+    logger.info(f"🎬 Converting video to GIF + spritesheet: {video_path.name}")
+
+    if gif_fps <= 0 or sheet_fps <= 0:
+        raise ValueError(f"FPS must be positive, got gif_fps={gif_fps}, sheet_fps={sheet_fps}")
+    cols, rows = _parse_grid(grid)
+    target_frames = frames if (frames and frames > 0) else cols * rows
+
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    try:
+        base_fps = math.lcm(gif_fps, sheet_fps)
+        cap = cv2.VideoCapture(str(video_path))
         try:
-            if temp_gif_path.exists():
-                temp_gif_path.unlink()
-        except Exception:
-            pass
+            source_fps, clip_duration, (width, height) = _probe_capture(
+                cap, video_path, base_fps, duration
+            )
+
+            # Ticks on the shared lcm timeline, mapped to source frame numbers
+            ticks = max(1, int(clip_duration * base_fps))
+            gif_step, sheet_step = base_fps // gif_fps, base_fps // sheet_fps
+            gif_ticks = range(0, ticks, gif_step)
+            sheet_ticks = [
+                i * sheet_step
+                for i in _select_frame_indices(
+                    len(range(0, ticks, sheet_step)), target_frames, sample_evenly=sample_evenly
+                )
+            ]
+            gif_numbers = [int(t * source_fps / base_fps + 1e-5) for t in gif_ticks]
+            sheet_numbers = [int(t * source_fps / base_fps + 1e-5) for t in sheet_ticks]
+
+            size = _constrain_size(width, height, max_width, max_height)
+            decoded, slots = _decode_frame_slots(
+                cap, sorted(set(gif_numbers) | set(sheet_numbers)), size
+            )
+        finally:
+            cap.release()
+        logger.info(f"   ✅ Decoded {len(decoded)} frames at {base_fps} FPS timeline")
+
+        gif_frames = _take_frames(decoded, slots, gif_numbers)
+        sheet_frames = _fill_grid(_take_frames(decoded, slots, sheet_numbers), cols * rows)
+
+        _ensure_parent_dir(gif_path)
+        logger.info(f"   Writing GIF with {gif_fps} FPS via ffmpeg...")
+        ImageSequenceClip(list(gif_frames[..., :3]), fps=gif_fps).write_gif(
+            str(gif_path), fps=gif_fps, program="ffmpeg"
+        )
+
+        from .cli import _create_spritesheet
+
+        _ensure_parent_dir(spritesheet_path)
+        _create_spritesheet(sheet_frames, cols, rows, spritesheet_path)
+
+        logger.info(f"   ✅ GIF and spritesheet created: {gif_path}, {spritesheet_path}")
+        return {"gif_path": gif_path, "spritesheet_path": spritesheet_path}
+
+    except Exception as e:
+        logger.error(f"❌ Combined conversion failed: {e}")
+        raise ValueError(f"Failed to produce outputs: {e}") from e
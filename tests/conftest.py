@@ -2,26 +2,29 @@
 Test configuration and fixtures for sprite-processor.
 """
 
+import functools
 import io
+import os
 import shutil
-import tempfile
 from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
 from PIL import Image, ImageDraw
 
 
 @pytest.fixture
-def temp_dir():
-    """Create a temporary directory for test files."""
-    temp_path = Path(tempfile.mkdtemp())
-    yield temp_path
-    shutil.rmtree(temp_path)
+def temp_dir(tmp_path):
+    """Create a temporary directory for test files.
 
+    Backed by ``tmp_path``, which is unique per test and per xdist worker, so tests
+    writing the same file names (e.g. ``spritesheet.png``) never collide.
+    """
+    return tmp_path
 
-@pytest.fixture
-def sample_image():
-    """Create a sample test image."""
+
+def _make_sample_image() -> Image.Image:
     img = Image.new("RGB", (64, 64), color=(255, 255, 255))
     draw = ImageDraw.Draw(img)
     # Draw a simple red circle
@@ -29,17 +32,73 @@ def sample_image():
     return img
 
 
+@pytest.fixture(scope="session")
+def missing_dir(tmp_path_factory):
+    """Empty directory shared across the session for paths that must not exist.
+
+    Nothing may be written here; tests only build paths under it to exercise
+    missing-file handling without creating a directory per test.
+    """
+    return tmp_path_factory.mktemp("missing")
+
+
 @pytest.fixture
-def sample_image_bytes(sample_image):
-    """Convert sample image to bytes."""
+def sample_image():
+    """Create a sample test image."""
+    return _make_sample_image()
+
+
+@pytest.fixture(scope="session")
+def sample_image_bytes():
+    """PNG-encoded sample image, encoded once per session."""
     img_bytes = io.BytesIO()
-    sample_image.save(img_bytes, format="PNG")
+    _make_sample_image().save(img_bytes, format="PNG")
     return img_bytes.getvalue()
 
 
-@pytest.fixture
-def sample_spritesheet():
-    """Create a sample spritesheet with 4 frames (2x2 grid)."""
+@pytest.fixture(scope="session")
+def sample_image_file(tmp_path_factory, sample_image_bytes):
+    """Canonical on-disk copy of ``sample_image_bytes``, written once per session."""
+    path = tmp_path_factory.mktemp("imgs") / "canon.png"
+    path.write_bytes(sample_image_bytes)
+    return path
+
+
+@pytest.fixture(scope="session")
+def link_sample_image(sample_image_file):
+    """Place the canonical sample image at a path without re-encoding or rewriting it.
+
+    Hard-links ``sample_image_file`` to the destination, falling back to a copy where
+    links are unsupported (e.g. across filesystems or on Windows). Tests must treat the
+    linked file as read-only since it shares its data with every other link.
+    """
+
+    def _link(dest: Path) -> Path:
+        try:
+            os.link(sample_image_file, dest)
+        except OSError:
+            shutil.copyfile(sample_image_file, dest)
+        return dest
+
+    return _link
+
+
+@pytest.fixture(scope="session")
+def upload_files():
+    """Build a multipart ``files`` mapping backed by a BytesIO stream.
+
+    Passing a stream lets the test client read the payload in chunks instead of
+    copying the raw bytes into the request body for every post().
+    """
+
+    def _files(name: str, data: bytes, content_type: str) -> dict:
+        return {"file": (name, io.BytesIO(data), content_type)}
+
+    return _files
+
+
+def _make_sample_spritesheet():
+    """Build the 2x2 sample spritesheet image."""
     # Create a 2x2 spritesheet (128x128 total)
     spritesheet = Image.new("RGB", (128, 128), color=(255, 255, 255))
     draw = ImageDraw.Draw(spritesheet)
@@ -59,6 +118,20 @@ def sample_spritesheet():
     return spritesheet
 
 
+@pytest.fixture
+def sample_spritesheet():
+    """Create a sample spritesheet with 4 frames (2x2 grid)."""
+    return _make_sample_spritesheet()
+
+
+@pytest.fixture(scope="session")
+def sample_spritesheet_bytes():
+    """PNG-encoded sample spritesheet, encoded once per session."""
+    img_bytes = io.BytesIO()
+    _make_sample_spritesheet().save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
 @pytest.fixture
 def sample_gif():
     """Create a sample animated GIF."""
@@ -79,39 +152,122 @@ def sample_gif():
     return gif_bytes.getvalue()
 
 
+@pytest.fixture(scope="session")
+def gif_pipeline_frames():
+    """Lightweight stand-ins for extracted GIF frames (only ``.size`` is read)."""
+    return [SimpleNamespace(size=(32, 32)) for _ in range(4)]
+
+
 @pytest.fixture
-def sample_video_file(temp_dir):
-    """Create a sample video file for testing."""
+def gif_pipeline_mocks(gif_pipeline_frames):
+    """Mock the GIF → spritesheet pipeline helpers.
+
+    Yields ``(extract, create, process)`` mocks for ``extract_gif_frames``,
+    ``_create_spritesheet`` and ``_process_one`` with their return values preset.
+    """
+    from sprite_processor import cli, video
+
+    with (
+        patch.object(video, "extract_gif_frames", autospec=True) as extract,
+        patch.object(cli, "_create_spritesheet", autospec=True) as create,
+        patch.object(cli, "_process_one", autospec=True) as process,
+    ):
+        extract.return_value = gif_pipeline_frames
+        create.return_value = None
+        process.return_value = None
+        yield extract, create, process
+
+
+@pytest.fixture(scope="session")
+def sample_video_file(tmp_path_factory):
+    """Create a sample video file for testing (written once per session, read-only)."""
     # For testing purposes, we'll create a simple video file
     # In real tests, you might want to use a small test video
-    video_path = temp_dir / "test_video.mp4"
+    video_path = tmp_path_factory.mktemp("video") / "test_video.mp4"
     # This is a placeholder - in real tests you'd use a small test video
     video_path.write_bytes(b"fake video content")
     return video_path
 
 
-@pytest.fixture
+class _MockSession:
+    """Lightweight stand-in for a rembg session; only ``predict`` is ever called."""
+
+    __slots__ = ("model_name",)
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def predict(self, img: Image.Image, *args, **kwargs) -> list[Image.Image]:
+        # Return a proper mask image (not bytes)
+        # The rembg library expects a mask image, not bytes
+        mask = Image.new("L", img.size, color=255)  # White mask (foreground)
+        return [mask]  # Return as list of masks
+
+
+@pytest.fixture(scope="session")
 def mock_rembg_session():
-    """Mock rembg session for testing."""
+    """Mock rembg session for testing.
 
-    class MockSession:
-        def __init__(self, model_name):
-            self.model_name = model_name
+    Returns a cached factory: calling it with a model name hands back the same
+    ``_MockSession`` instance for that model for the whole test session, so the
+    session is built once per model rather than once per test.
+    """
+    return functools.lru_cache(maxsize=8)(_MockSession)
 
-        def predict(self, img, *args, **kwargs):
-            # Return a proper mask image (not bytes)
-            # The rembg library expects a mask image, not bytes
-            mask = Image.new("L", img.size, color=255)  # White mask (foreground)
-            return [mask]  # Return as list of masks
 
-    return MockSession
+@pytest.fixture(autouse=True)
+def patched_new_session(mock_rembg_session):
+    """Route ``sprite_processor.new_session`` to the cached mock sessions for every test.
 
+    ``new_session(model)`` returns ``mock_rembg_session(model)``, so no test ever loads a
+    real rembg model. Tests that need a failure set ``side_effect`` on the yielded mock.
+    """
+    with patch("sprite_processor.new_session", side_effect=mock_rembg_session) as mock_new:
+        yield mock_new
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def api_client():
-    """Create a test client for the API."""
+    """Create a test client for the API (shared per xdist worker).
+
+    The client is entered once so the app's lifespan and the client's event-loop
+    portal are set up for the whole session rather than on every request.
+    """
     from fastapi.testclient import TestClient
 
     from sprite_processor.api import api
 
-    return TestClient(api)
+    with TestClient(api) as client:
+        yield client
+
+
+@pytest.fixture
+def mock_remover():
+    """Install a mock background remover through the API's dependency overrides.
+
+    Overriding ``get_remover`` is a plain dict assignment on the app, which is cheaper
+    than patching the module attribute; the override is removed on teardown.
+    """
+    from unittest.mock import create_autospec
+
+    from sprite_processor import remove_bytes
+    from sprite_processor.api import api, get_remover
+
+    remover = create_autospec(remove_bytes)
+    api.dependency_overrides[get_remover] = lambda: remover
+    yield remover
+    api.dependency_overrides.pop(get_remover, None)
+
+
+@pytest.fixture
+def async_api_client():
+    """Create an in-process async client for the API.
+
+    Enter it with ``async with`` inside an ``asyncio`` test; requests issued through
+    ``asyncio.gather`` are then served concurrently instead of one at a time.
+    """
+    import httpx
+
+    from sprite_processor.api import api
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test")
@@ -2,8 +2,37 @@
 Tests for API endpoints.
 """
 
+import asyncio
 import io
-from unittest.mock import MagicMock, patch
+from unittest.mock import call, patch
+
+import orjson
+import pytest
+from PIL import Image, ImageDraw
+
+from sprite_processor import api as _api_mod
+
+# Shared payloads; bytes are immutable so one files mapping serves every video test
+_FAKE_VIDEO = b"fake video data"
+_FAKE_MP4_FILES = {"file": ("test.mp4", _FAKE_VIDEO, "video/mp4")}
+_FAKE_PROCESSED = b"fake_processed_image_data"
+
+
+def _grid_sheet(cols: int, rows: int, cell: int = 64) -> Image.Image:
+    """Build a ``cols`` x ``rows`` sheet of opaque 40px boxes on a transparent background."""
+    # Transparent white: the detector also counts non-white RGB as foreground
+    sheet = Image.new("RGBA", (cols * cell, rows * cell), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(sheet)
+    for row in range(rows):
+        for col in range(cols):
+            x, y = col * cell + 12, row * cell + 12
+            draw.rectangle([x, y, x + 39, y + 39], fill=(200, 30, 30, 255))
+    return sheet
+
+
+def _json(response):
+    """Decode a JSON response body with orjson (faster than response.json())."""
+    return orjson.loads(response.content)
 
 
 class TestHealthEndpoint:
@@ -13,125 +42,126 @@ class TestHealthEndpoint:
         """Test that health endpoint returns OK."""
         response = api_client.get("/health")
         assert response.status_code == 200
-        assert response.json() == {"ok": True}
+        # JSONResponse renders compactly, so the body is stable byte-for-byte
+        assert response.content == b'{"ok":true}'
 
 
 class TestRemoveEndpoint:
     """Test the background removal endpoint."""
 
-    def test_remove_endpoint_success(self, api_client, sample_image_bytes):
+    def test_remove_endpoint_success(
+        self, api_client, sample_image_bytes, upload_files, mock_remover
+    ):
         """Test successful background removal."""
-        with patch("sprite_processor.api.remove_bytes") as mock_remove:
-            mock_remove.return_value = b"fake_processed_image_data"
-
-            files = {"file": ("test.png", sample_image_bytes, "image/png")}
-            data = {"model": "isnet-general-use"}
+        mock_remover.return_value = _FAKE_PROCESSED
 
-            response = api_client.post("/remove", files=files, data=data)
+        files = upload_files("test.png", sample_image_bytes, "image/png")
+        data = {"model": "isnet-general-use"}
 
-            assert response.status_code == 200
-            assert response.headers["content-type"] == "image/png"
-            assert response.content == b"fake_processed_image_data"
+        response = api_client.post("/remove", files=files, data=data)
 
-    def test_remove_endpoint_no_file(self, api_client):
-        """Test remove endpoint without file."""
-        response = api_client.post("/remove")
-        assert response.status_code == 422  # Validation error
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content == _FAKE_PROCESSED
 
-    def test_remove_endpoint_different_models(self, api_client, sample_image_bytes):
+    @pytest.mark.parametrize("model", ["isnet-general-use", "u2net_human_seg", "u2net"])
+    def test_remove_endpoint_different_models(
+        self, api_client, sample_image_bytes, upload_files, mock_remover, model
+    ):
         """Test remove endpoint with different models."""
-        models = ["isnet-general-use", "u2net_human_seg", "u2net"]
+        mock_remover.return_value = _FAKE_PROCESSED
+
+        files = upload_files("test.png", sample_image_bytes, "image/png")
+        data = {"model": model}
 
-        with patch("sprite_processor.api.remove_bytes") as mock_remove:
-            mock_remove.return_value = b"fake_processed_image_data"
+        response = api_client.post("/remove", files=files, data=data)
+        assert response.status_code == 200
+        mock_remover.assert_called_once_with(sample_image_bytes, model_name=model)
+
+    @pytest.mark.asyncio
+    async def test_remove_endpoint_models_concurrently(
+        self, async_api_client, sample_image_bytes, upload_files, mock_remover
+    ):
+        """Test remove endpoint serving several model requests at once."""
+        models = ["isnet-general-use", "u2net_human_seg", "u2net"]
 
-            for model in models:
-                files = {"file": ("test.png", sample_image_bytes, "image/png")}
-                data = {"model": model}
+        mock_remover.return_value = _FAKE_PROCESSED
+
+        async with async_api_client as client:
+            responses = await asyncio.gather(
+                *[
+                    client.post(
+                        "/remove",
+                        files=upload_files("test.png", sample_image_bytes, "image/png"),
+                        data={"model": model},
+                    )
+                    for model in models
+                ]
+            )
 
-                response = api_client.post("/remove", files=files, data=data)
-                assert response.status_code == 200
-                mock_remove.assert_called_with(sample_image_bytes, model_name=model)
+        assert [r.status_code for r in responses] == [200] * len(models)
+        # Requests may reach the remover in any order; compare the whole call list at once
+        calls = sorted(mock_remover.call_args_list, key=lambda c: c.kwargs["model_name"])
+        assert calls == [call(sample_image_bytes, model_name=m) for m in sorted(models)]
 
 
 class TestSpritesheetEndpoint:
     """Test the spritesheet processing endpoint."""
 
-    def test_spritesheet_endpoint_success(self, api_client, sample_spritesheet):
+    def test_spritesheet_endpoint_success(
+        self, api_client, sample_spritesheet, sample_spritesheet_bytes
+    ):
         """Test successful spritesheet processing."""
-        # Convert spritesheet to bytes
-        img_bytes = io.BytesIO()
-        sample_spritesheet.save(img_bytes, format="PNG")
-        spritesheet_bytes = img_bytes.getvalue()
-
-        with patch("sprite_processor.api._maybe_process_frame") as mock_process:
+        with patch.object(_api_mod, "_maybe_process_frame", autospec=True) as mock_process:
             # Mock the processing to return the original image
             mock_process.return_value = sample_spritesheet
 
-            files = {"file": ("spritesheet.png", spritesheet_bytes, "image/png")}
+            files = {"file": ("spritesheet.png", sample_spritesheet_bytes, "image/png")}
             data = {"grid": "2x2", "frames": "4", "model": "isnet-general-use"}
 
             response = api_client.post("/process/spritesheet", files=files, data=data)
 
             assert response.status_code == 200
-            result = response.json()
+            result = _json(response)
             assert result["success"] is True
             assert "spritesheet" in result
             assert "config" in result
 
-    def test_spritesheet_endpoint_gif_input(self, api_client, sample_gif):
+    def test_spritesheet_endpoint_gif_input(self, api_client, sample_gif, gif_pipeline_mocks):
         """Test spritesheet processing with GIF input."""
-        # Mock the entire spritesheet processing pipeline
-        with (
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            # Mock the GIF frame extraction
-            mock_frames = [MagicMock() for _ in range(4)]
-            for frame in mock_frames:
-                frame.size = (32, 32)
-            mock_extract_frames.return_value = mock_frames
-
-            # Mock the spritesheet creation
-            mock_create_spritesheet.return_value = None
-
-            # Mock the background removal
-            mock_process_one.return_value = None
-
-            files = {"file": ("animation.gif", sample_gif, "image/gif")}
-            data = {"grid": "auto", "frames": "4", "model": "isnet-general-use"}
+        # gif_pipeline_mocks stubs frame extraction, spritesheet creation and bg removal
+        files = {"file": ("animation.gif", sample_gif, "image/gif")}
+        data = {"grid": "auto", "frames": "4", "model": "isnet-general-use"}
 
-            response = api_client.post("/process/spritesheet", files=files, data=data)
+        response = api_client.post("/process/spritesheet", files=files, data=data)
 
-            assert response.status_code == 200
-            result = response.json()
-            assert result["success"] is True
+        assert response.status_code == 200
+        result = _json(response)
+        assert result["success"] is True
 
-    def test_spritesheet_endpoint_invalid_grid(self, api_client, sample_image_bytes):
+    def test_spritesheet_endpoint_invalid_grid(self, api_client, sample_image_bytes, upload_files):
         """Test spritesheet processing with invalid grid format."""
-        files = {"file": ("test.png", sample_image_bytes, "image/png")}
+        files = upload_files("test.png", sample_image_bytes, "image/png")
         data = {"grid": "invalid", "frames": "4"}
 
         response = api_client.post("/process/spritesheet", files=files, data=data)
         assert response.status_code == 400
         assert "Grid must be 'colsxrows'" in response.json()["detail"]
 
-    def test_spritesheet_endpoint_no_file(self, api_client):
-        """Test spritesheet endpoint without file."""
-        response = api_client.post("/process/spritesheet")
-        assert response.status_code == 422
-
 
 class TestVideoToGifEndpoint:
     """Test the video to GIF endpoint."""
 
-    def test_video_to_gif_endpoint_success(self, api_client, sample_video_file):
+    def test_video_to_gif_endpoint_success(self, api_client, temp_dir, sample_gif):
         """Test successful video to GIF conversion."""
-        with patch("sprite_processor.api.video_to_gif") as mock_video_to_gif:
-            mock_video_to_gif.return_value = sample_video_file
-
-            files = {"file": ("test.mp4", b"fake video data", "video/mp4")}
+        # The endpoint deletes its result after streaming it, so hand back a per-test file
+        # rather than the shared session video
+        result_path = temp_dir / "result.gif"
+        result_path.write_bytes(sample_gif)
+        with patch.object(_api_mod, "video_to_gif", autospec=True) as mock_video_to_gif:
+            mock_video_to_gif.return_value = result_path
+
+            files = _FAKE_MP4_FILES
             data = {"fps": "10", "duration": "5.0", "max_width": "480", "max_height": "480"}
 
             response = api_client.post("/process/video-to-gif", files=files, data=data)
@@ -150,18 +180,13 @@ class TestVideoToGifEndpoint:
         assert response.headers["content-type"] == "image/gif"
         assert response.content == sample_gif
 
-    def test_video_to_gif_endpoint_no_file(self, api_client):
-        """Test video to GIF endpoint without file."""
-        response = api_client.post("/process/video-to-gif")
-        assert response.status_code == 422
-
 
 class TestAnalyzeVideoEndpoint:
     """Test the video analysis endpoint."""
 
     def test_analyze_video_endpoint_success(self, api_client, sample_video_file):
         """Test successful video analysis."""
-        with patch("sprite_processor.api.analyze_video") as mock_analyze:
+        with patch.object(_api_mod, "analyze_video", autospec=True) as mock_analyze:
             mock_analyze.return_value = {
                 "fps": 10,
                 "duration": 5.0,
@@ -170,28 +195,23 @@ class TestAnalyzeVideoEndpoint:
                 "height": 720,
             }
 
-            files = {"file": ("test.mp4", b"fake video data", "video/mp4")}
+            files = _FAKE_MP4_FILES
 
             response = api_client.post("/analyze/video", files=files)
 
             assert response.status_code == 200
-            result = response.json()
+            result = _json(response)
             assert result["analysis"]["fps"] == 10
             assert result["analysis"]["duration"] == 5.0
             assert result["analysis"]["frames"] == 50
 
-    def test_analyze_video_endpoint_no_file(self, api_client):
-        """Test analyze video endpoint without file."""
-        response = api_client.post("/analyze/video")
-        assert response.status_code == 422
-
 
 class TestPipelineEndpoints:
     """Test the pipeline processing endpoints."""
 
     def test_process_video_pipeline_endpoint(self, api_client, sample_video_file):
         """Test video pipeline processing endpoint."""
-        with patch("sprite_processor.api.process_video_pipeline") as mock_pipeline:
+        with patch.object(_api_mod, "process_video_pipeline", autospec=True) as mock_pipeline:
             mock_pipeline.return_value = {
                 "success": True,
                 "gif_path": sample_video_file,
@@ -199,7 +219,7 @@ class TestPipelineEndpoints:
                 "processed_path": sample_video_file,
             }
 
-            files = {"file": ("test.mp4", b"fake video data", "video/mp4")}
+            files = _FAKE_MP4_FILES
             data = {
                 "fps": "10",
                 "duration": "5.0",
@@ -210,12 +230,14 @@ class TestPipelineEndpoints:
             response = api_client.post("/process/video-pipeline", files=files, data=data)
 
             assert response.status_code == 200
-            result = response.json()
+            result = _json(response)
             assert result["success"] is True
 
     def test_process_video_pipeline_all_models_endpoint(self, api_client, sample_video_file):
         """Test video pipeline processing with all models endpoint."""
-        with patch("sprite_processor.api.process_video_pipeline_all_models") as mock_pipeline:
+        with patch.object(
+            _api_mod, "process_video_pipeline_all_models", autospec=True
+        ) as mock_pipeline:
             mock_pipeline.return_value = {
                 "gif_path": sample_video_file,
                 "spritesheet_path": sample_video_file,
@@ -231,7 +253,7 @@ class TestPipelineEndpoints:
                 },
             }
 
-            files = {"file": ("test.mp4", b"fake video data", "video/mp4")}
+            files = _FAKE_MP4_FILES
             data = {
                 "fps": "10",
                 "duration": "5.0",
@@ -243,7 +265,7 @@ class TestPipelineEndpoints:
             )
 
             assert response.status_code == 200
-            result = response.json()
+            result = _json(response)
             assert result["success"] is True
             assert "model_results" in result
 
@@ -251,81 +273,85 @@ class TestPipelineEndpoints:
 class TestRemoveAllModelsEndpoint:
     """Test the remove all models endpoint."""
 
-    def test_remove_all_models_endpoint_success(self, api_client, sample_image_bytes):
+    def test_remove_all_models_endpoint_success(
+        self, api_client, sample_image_bytes, upload_files, mock_remover
+    ):
         """Test successful processing with all models."""
-        with patch("sprite_processor.api.remove_bytes") as mock_remove:
-            mock_remove.return_value = b"fake_processed_image_data"
+        mock_remover.return_value = _FAKE_PROCESSED
 
-            files = {"file": ("test.png", sample_image_bytes, "image/png")}
+        files = upload_files("test.png", sample_image_bytes, "image/png")
 
-            response = api_client.post("/remove-all-models", files=files)
+        response = api_client.post("/remove-all-models", files=files)
 
-            assert response.status_code == 200
-            result = response.json()
-            assert "models" in result
-            assert len(result["models"]) > 0  # Should have results for multiple models
-
-    def test_remove_all_models_endpoint_no_file(self, api_client):
-        """Test remove all models endpoint without file."""
-        response = api_client.post("/remove-all-models")
-        assert response.status_code == 422
+        assert response.status_code == 200
+        result = _json(response)
+        assert "models" in result
+        assert len(result["models"]) > 0  # Should have results for multiple models
 
 
 class TestAPIErrorHandling:
     """Test API error handling."""
 
-    def test_remove_endpoint_processing_error(self, api_client, sample_image_bytes):
-        """Test remove endpoint with processing error."""
-        with patch("sprite_processor.api.remove_bytes") as mock_remove:
-            mock_remove.side_effect = Exception("Processing failed")
-
-            files = {"file": ("test.png", sample_image_bytes, "image/png")}
+    @pytest.mark.parametrize(
+        "attr,url,data",
+        [
+            ("remove_bytes", "/remove", None),
+            (
+                "_maybe_process_frame",
+                "/process/spritesheet",
+                {"grid": "2x2", "frames": "4"},
+            ),
+        ],
+        ids=["remove", "spritesheet"],
+    )
+    def test_endpoint_processing_error(
+        self, api_client, sample_image_bytes, upload_files, attr, url, data
+    ):
+        """Test that a processing error surfaces as a 500 with the error detail."""
+        with patch.object(
+            _api_mod, attr, autospec=True, side_effect=Exception("Processing failed")
+        ):
+            files = upload_files("test.png", sample_image_bytes, "image/png")
 
-            response = api_client.post("/remove", files=files)
+            response = api_client.post(url, files=files, data=data)
 
             assert response.status_code == 500
             assert "Processing failed" in response.json()["detail"]
 
-    def test_spritesheet_endpoint_processing_error(self, api_client, sample_image_bytes):
-        """Test spritesheet endpoint with processing error."""
-        with patch("sprite_processor.api._maybe_process_frame") as mock_process:
-            mock_process.side_effect = Exception("Processing failed")
-
-            files = {"file": ("test.png", sample_image_bytes, "image/png")}
-            data = {"grid": "2x2", "frames": "4"}
-
-            response = api_client.post("/process/spritesheet", files=files, data=data)
-
-            assert response.status_code == 500
-            assert "Processing failed" in response.json()["detail"]
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "/remove",
+            "/process/spritesheet",
+            "/process/video-to-gif",
+            "/analyze/video",
+            "/remove-all-models",
+            "/analyze-spritesheet",
+            "/process/gif-to-spritesheet",
+        ],
+    )
+    def test_endpoint_no_file(self, api_client, url):
+        """Test that every upload endpoint rejects a request without a file."""
+        assert api_client.post(url).status_code == 422  # Validation error
 
 
 class TestAnalyzeSpritesheetEndpoint:
     """Test the analyze spritesheet endpoint."""
 
-    def test_analyze_spritesheet_endpoint_success(self, api_client, sample_image_bytes):
-        """Test successful spritesheet analysis."""
-        with patch("sprite_processor.api.Image") as mock_image:
-            # Mock PIL Image
-            mock_img = MagicMock()
-            mock_img.size = (100, 50)  # 100x50 spritesheet
-            mock_image.open.return_value = mock_img
-
-            files = {"file": ("spritesheet.png", sample_image_bytes, "image/png")}
+    def test_analyze_spritesheet_endpoint_success(self, api_client, upload_files):
+        """Test successful spritesheet analysis of a real 4x2 sheet."""
+        buf = io.BytesIO()
+        _grid_sheet(4, 2).save(buf, format="PNG")
+        files = upload_files("spritesheet.png", buf.getvalue(), "image/png")
 
-            response = api_client.post("/analyze-spritesheet", files=files)
-
-            assert response.status_code == 200
-            result = response.json()
-            assert "spritesheet_size" in result
-            assert "suggested_layouts" in result
-            assert "width_divisors" in result
-            assert "height_divisors" in result
+        response = api_client.post("/analyze-spritesheet", files=files)
 
-    def test_analyze_spritesheet_endpoint_no_file(self, api_client):
-        """Test analyze spritesheet endpoint without file."""
-        response = api_client.post("/analyze-spritesheet")
-        assert response.status_code == 422
+        assert response.status_code == 200
+        result = _json(response)
+        assert result["spritesheet_size"] == "256x128"
+        assert result["best_guess"]["grid"] == "4x2"
+        assert result["best_guess"]["total_frames"] == 8
+        assert len(result["boxes_row_major"]) == 8
 
     def test_analyze_spritesheet_endpoint_invalid_file(self, api_client):
         """Test analyze spritesheet endpoint with invalid file."""
@@ -335,36 +361,41 @@ class TestAnalyzeSpritesheetEndpoint:
         assert response.status_code == 500  # API returns 500 for invalid images
 
 
-class TestGifToSpritesheetEndpoint:
-    """Test the GIF to spritesheet endpoint."""
+class TestDetectSpritesheetGrid:
+    """Test the _detect_spritesheet_grid helper behind /analyze-spritesheet."""
 
-    def test_gif_to_spritesheet_endpoint_success(self, api_client, sample_gif):
-        """Test successful GIF to spritesheet conversion."""
-        with (
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            # Mock the GIF frame extraction
-            mock_frames = [MagicMock() for _ in range(4)]
-            for frame in mock_frames:
-                frame.size = (32, 32)
-            mock_extract_frames.return_value = mock_frames
+    def test_detect_spritesheet_grid_4x2(self):
+        """Test that a 4x2 sheet of boxes is detected as a 4x2 grid."""
+        result = _api_mod._detect_spritesheet_grid(_grid_sheet(4, 2))
 
-            # Mock the spritesheet creation
-            mock_create_spritesheet.return_value = None
+        assert result["spritesheet_size"] == "256x128"
+        assert result["best_guess"]["grid"] == "4x2"
+        assert result["best_guess"]["total_frames"] == 8
+        assert result["best_guess"]["detected_sprites"] == 8
+        assert result["diagnostics"]["median_pitch"] == {"x": 64, "y": 64}
 
-            # Mock the background removal
-            mock_process_one.return_value = None
+        # Boxes come back row-major: the whole first row before the second
+        boxes = result["boxes_row_major"]
+        assert len(boxes) == 8
+        assert [y for _, y, _, _ in boxes[:4]] == [boxes[0][1]] * 4
+        assert [x for x, _, _, _ in boxes[:4]] == sorted(x for x, _, _, _ in boxes[:4])
+        assert boxes[4][1] > boxes[0][1]
 
-            files = {"file": ("animation.gif", sample_gif, "image/gif")}
-            data = {"grid": "2x2", "frames": "4"}
 
-            response = api_client.post("/process/gif-to-spritesheet", files=files, data=data)
+class TestGifToSpritesheetEndpoint:
+    """Test the GIF to spritesheet endpoint."""
 
-            assert response.status_code == 200
-            result = response.json()
-            assert "success" in result
+    def test_gif_to_spritesheet_endpoint_success(self, api_client, sample_gif, gif_pipeline_mocks):
+        """Test successful GIF to spritesheet conversion."""
+        # gif_pipeline_mocks stubs frame extraction, spritesheet creation and bg removal
+        files = {"file": ("animation.gif", sample_gif, "image/gif")}
+        data = {"grid": "2x2", "frames": "4"}
+
+        response = api_client.post("/process/gif-to-spritesheet", files=files, data=data)
+
+        assert response.status_code == 200
+        result = _json(response)
+        assert "success" in result
 
     def test_gif_to_spritesheet_endpoint_invalid_grid(self, api_client, sample_gif):
         """Test GIF to spritesheet endpoint with invalid grid format."""
@@ -374,8 +405,3 @@ class TestGifToSpritesheetEndpoint:
         response = api_client.post("/process/gif-to-spritesheet", files=files, data=data)
         assert response.status_code == 400
         assert "Grid must be in format" in response.json()["detail"]
-
-    def test_gif_to_spritesheet_endpoint_no_file(self, api_client):
-        """Test GIF to spritesheet endpoint without file."""
-        response = api_client.post("/process/gif-to-spritesheet")
-        assert response.status_code == 422
@@ -2,113 +2,121 @@
 Tests for CLI functionality.
 """
 
-from unittest.mock import patch
+import io
+import struct
+from unittest.mock import MagicMock
 
+import numpy as np
 import pytest
+from click.testing import CliRunner
+from PIL import Image
 
-from sprite_processor.cli import _process_one, app
+from sprite_processor import cli as _cli_mod
+from sprite_processor import pipeline as _pipeline_mod
+from sprite_processor import video as _video_mod
+from sprite_processor.cli import _create_spritesheet, _process_one, app
 
+# One runner for the whole module; invoke() isolates its own I/O per call
+RUNNER = CliRunner()
 
-class TestProcessOne:
-    """Test the _process_one function."""
-
-    def test_process_one_success(self, temp_dir, sample_image_bytes, mock_rembg_session):
-        """Test successful single file processing."""
-        input_path = temp_dir / "input.png"
-        output_path = temp_dir / "output.png"
-
-        input_path.write_bytes(sample_image_bytes)
-
-        with patch("sprite_processor.cli.remove_bytes") as mock_remove_bytes:
-            mock_remove_bytes.return_value = b"processed_image_data"
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
 
-            result = _process_one(str(input_path), str(output_path), False, "isnet-general-use")
+# Shared, read-only spritesheet frames
+_RED_FRAME = Image.new("RGBA", (32, 32), color=(255, 0, 0, 255))
+_GREEN_FRAME_16 = Image.new("RGBA", (16, 16), color=(0, 255, 0, 255))
+_BLUE_FRAME = Image.new("RGBA", (32, 32), color=(0, 0, 255, 255))
 
-            assert result == output_path
-            mock_remove_bytes.assert_called_once_with(
-                sample_image_bytes, model_name="isnet-general-use"
-            )
 
-            # Check that output file was created
-            assert output_path.exists()
-            assert output_path.read_bytes() == b"processed_image_data"
+def _png_size(data: bytes) -> tuple[int, int]:
+    """Read (width, height) straight from a PNG's IHDR chunk without decoding it."""
+    assert data[:8] == _PNG_SIG
+    return struct.unpack(">II", data[16:24])
 
-    def test_process_one_overwrite_false(self, temp_dir, sample_image_bytes, mock_rembg_session):
-        """Test process_one with overwrite=False when output exists."""
-        input_path = temp_dir / "input.png"
-        output_path = temp_dir / "output.png"
 
-        input_path.write_bytes(sample_image_bytes)
-        output_path.write_bytes(b"existing_data")  # Create existing output
-
-        with patch("sprite_processor.cli.remove_bytes") as mock_remove_bytes:
-            with pytest.raises(FileExistsError, match="Output exists"):
-                _process_one(str(input_path), str(output_path), False, "isnet-general-use")
+class TestProcessOne:
+    """Test the _process_one function."""
 
-            # Should not call remove_bytes
-            mock_remove_bytes.assert_not_called()
+    @pytest.fixture
+    def io_paths(self, temp_dir, link_sample_image):
+        """Input path holding the sample image, plus a (not yet created) output path."""
+        return link_sample_image(temp_dir / "input.png"), temp_dir / "output.png"
+
+    @pytest.mark.parametrize(
+        "overwrite,existing",
+        [(False, None), (True, b"existing_data")],
+        ids=["new_output", "overwrite_existing"],
+    )
+    def test_process_one_success(
+        self, io_paths, sample_image_bytes, mock_rembg_session, overwrite, existing, monkeypatch
+    ):
+        """Test successful single file processing, with and without an existing output."""
+        input_path, output_path = io_paths
+        if existing is not None:
+            output_path.write_bytes(existing)  # Create existing output
+
+        mock_remove_bytes = MagicMock(return_value=b"processed_image_data")
+        monkeypatch.setattr(_cli_mod, "remove_bytes", mock_remove_bytes)
+
+        result = _process_one(str(input_path), str(output_path), overwrite, "isnet-general-use")
 
-            # Original data should still be there
-            assert output_path.read_bytes() == b"existing_data"
+        assert result == output_path
+        mock_remove_bytes.assert_called_once_with(
+            sample_image_bytes, model_name="isnet-general-use"
+        )
 
-    def test_process_one_overwrite_true(self, temp_dir, sample_image_bytes, mock_rembg_session):
-        """Test process_one with overwrite=True when output exists."""
-        input_path = temp_dir / "input.png"
-        output_path = temp_dir / "output.png"
+        # Check that output file was (re)written
+        assert output_path.read_bytes() == b"processed_image_data"
 
-        input_path.write_bytes(sample_image_bytes)
+    def test_process_one_overwrite_false(self, io_paths, mock_rembg_session, monkeypatch):
+        """Test process_one with overwrite=False when output exists."""
+        input_path, output_path = io_paths
         output_path.write_bytes(b"existing_data")  # Create existing output
 
-        with patch("sprite_processor.cli.remove_bytes") as mock_remove_bytes:
-            mock_remove_bytes.return_value = b"new_processed_data"
+        mock_remove_bytes = MagicMock()
+        monkeypatch.setattr(_cli_mod, "remove_bytes", mock_remove_bytes)
 
-            result = _process_one(str(input_path), str(output_path), True, "isnet-general-use")
+        with pytest.raises(FileExistsError, match="Output exists"):
+            _process_one(str(input_path), str(output_path), False, "isnet-general-use")
 
-            assert result == output_path
-            mock_remove_bytes.assert_called_once_with(
-                sample_image_bytes, model_name="isnet-general-use"
-            )
+        # Should not call remove_bytes
+        mock_remove_bytes.assert_not_called()
 
-            # Should have new data
-            assert output_path.read_bytes() == b"new_processed_data"
+        # Original data should still be there
+        assert output_path.read_bytes() == b"existing_data"
 
-    def test_process_one_processing_error(self, temp_dir, sample_image_bytes):
+    def test_process_one_processing_error(self, io_paths, monkeypatch):
         """Test process_one with processing error."""
-        input_path = temp_dir / "input.png"
-        output_path = temp_dir / "output.png"
-
-        input_path.write_bytes(sample_image_bytes)
+        input_path, output_path = io_paths
 
-        with patch("sprite_processor.cli.remove_bytes") as mock_remove_bytes:
-            mock_remove_bytes.side_effect = Exception("Processing failed")
+        monkeypatch.setattr(
+            _cli_mod, "remove_bytes", MagicMock(side_effect=Exception("Processing failed"))
+        )
 
-            with pytest.raises(Exception, match="Processing failed"):
-                _process_one(str(input_path), str(output_path), False, "isnet-general-use")
+        with pytest.raises(Exception, match="Processing failed"):
+            _process_one(str(input_path), str(output_path), False, "isnet-general-use")
 
-    def test_process_one_nonexistent_input(self, temp_dir):
+    def test_process_one_nonexistent_input(self, missing_dir):
         """Test process_one with non-existent input file."""
-        input_path = temp_dir / "nonexistent.png"
-        output_path = temp_dir / "output.png"
+        input_path = missing_dir / "nonexistent.png"
+        output_path = missing_dir / "output.png"
 
         with pytest.raises(FileNotFoundError):
             _process_one(str(input_path), str(output_path), False, "isnet-general-use")
 
-    def test_process_one_different_models(self, temp_dir, sample_image_bytes, mock_rembg_session):
+    @pytest.mark.parametrize("model", ["isnet-general-use", "u2net_human_seg", "u2net"])
+    def test_process_one_different_models(
+        self, io_paths, sample_image_bytes, mock_rembg_session, model, monkeypatch
+    ):
         """Test process_one with different model names."""
-        input_path = temp_dir / "input.png"
-        output_path = temp_dir / "output.png"
-
-        input_path.write_bytes(sample_image_bytes)
+        input_path, output_path = io_paths
 
-        models = ["isnet-general-use", "u2net_human_seg", "u2net"]
+        mock_remove_bytes = MagicMock(return_value=b"processed_image_data")
+        monkeypatch.setattr(_cli_mod, "remove_bytes", mock_remove_bytes)
 
-        with patch("sprite_processor.cli.remove_bytes") as mock_remove_bytes:
-            mock_remove_bytes.return_value = b"processed_image_data"
+        result = _process_one(str(input_path), str(output_path), True, model)
 
-            for model in models:
-                result = _process_one(str(input_path), str(output_path), True, model)
-                assert result == output_path
-                mock_remove_bytes.assert_called_with(sample_image_bytes, model_name=model)
+        assert result == output_path
+        mock_remove_bytes.assert_called_once_with(sample_image_bytes, model_name=model)
 
 
 class TestCLIApp:
@@ -116,41 +124,32 @@ class TestCLIApp:
 
     def test_app_help(self):
         """Test that app function shows help when called with --help."""
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(app, ["--help"])
+        result = RUNNER.invoke(app, ["--help"])
         assert result.exit_code == 0
         assert "Usage:" in result.output
 
 
     def test_app_invalid_args(self):
         """Test app function with invalid arguments."""
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(app, ["--invalid-arg"])
+        result = RUNNER.invoke(app, ["--invalid-arg"])
         assert result.exit_code != 0
 
-    def test_app_process_file(self, temp_dir, sample_image_bytes):
+    def test_app_process_file(self, temp_dir, link_sample_image, monkeypatch):
         """Test app function processing a single file."""
         input_path = temp_dir / "input.png"
         output_path = temp_dir / "output.png"
 
-        input_path.write_bytes(sample_image_bytes)
-
-        with patch("sprite_processor.cli._process_one") as mock_process_one:
-            mock_process_one.return_value = str(output_path)
+        link_sample_image(input_path)
 
-            from click.testing import CliRunner
+        mock_process_one = MagicMock(return_value=str(output_path))
+        monkeypatch.setattr(_cli_mod, "_process_one", mock_process_one)
 
-            runner = CliRunner()
-            result = runner.invoke(app, ["one", str(input_path), "--output", str(output_path)])
+        result = RUNNER.invoke(app, ["one", str(input_path), "--output", str(output_path)])
 
-            assert result.exit_code == 0
-            mock_process_one.assert_called_once_with(input_path, output_path, False)
+        assert result.exit_code == 0
+        mock_process_one.assert_called_once_with(input_path, output_path, False)
 
-    def test_app_process_directory(self, temp_dir, sample_image_bytes):
+    def test_app_process_directory(self, temp_dir, link_sample_image, monkeypatch):
         """Test app function processing a directory."""
         input_dir = temp_dir / "input"
         output_dir = temp_dir / "output"
@@ -161,111 +160,90 @@ class TestCLIApp:
         # Create test images
         for i in range(3):
             img_path = input_dir / f"image{i}.png"
-            img_path.write_bytes(sample_image_bytes)
+            link_sample_image(img_path)
 
-        with patch("sprite_processor.cli._process_one") as mock_process_one:
-            mock_process_one.return_value = "processed_path"
+        mock_process_one = MagicMock(return_value="processed_path")
+        monkeypatch.setattr(_cli_mod, "_process_one", mock_process_one)
 
-            from click.testing import CliRunner
+        result = RUNNER.invoke(app, ["batch", str(input_dir), str(output_dir)])
 
-            runner = CliRunner()
-            result = runner.invoke(app, ["batch", str(input_dir), str(output_dir)])
-
-            assert result.exit_code == 0
-            # Should process each image in the directory
-            assert mock_process_one.call_count == 3
+        assert result.exit_code == 0
+        # Should process each image in the directory
+        assert mock_process_one.call_count == 3
 
-    def test_app_with_overwrite(self, temp_dir, sample_image_bytes):
+    def test_app_with_overwrite(self, temp_dir, link_sample_image, monkeypatch):
         """Test app function with overwrite flag."""
         input_path = temp_dir / "input.png"
         output_path = temp_dir / "output.png"
 
-        input_path.write_bytes(sample_image_bytes)
-
-        with patch("sprite_processor.cli._process_one") as mock_process_one:
-            mock_process_one.return_value = str(output_path)
+        link_sample_image(input_path)
 
-            from click.testing import CliRunner
+        mock_process_one = MagicMock(return_value=str(output_path))
+        monkeypatch.setattr(_cli_mod, "_process_one", mock_process_one)
 
-            runner = CliRunner()
-            result = runner.invoke(
-                app, ["one", str(input_path), "--output", str(output_path), "--overwrite"]
-            )
+        result = RUNNER.invoke(
+            app, ["one", str(input_path), "--output", str(output_path), "--overwrite"]
+        )
 
-            assert result.exit_code == 0
-            mock_process_one.assert_called_once_with(input_path, output_path, True)
+        assert result.exit_code == 0
+        mock_process_one.assert_called_once_with(input_path, output_path, True)
 
 
 class TestCLIErrorHandling:
     """Test CLI error handling."""
 
-    def test_app_nonexistent_input_file(self, temp_dir):
+    def test_app_nonexistent_input_file(self, missing_dir):
         """Test app function with non-existent input file."""
-        input_path = temp_dir / "nonexistent.png"
-        output_path = temp_dir / "output.png"
+        input_path = missing_dir / "nonexistent.png"
+        output_path = missing_dir / "output.png"
 
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(app, ["one", str(input_path), "--output", str(output_path)])
+        result = RUNNER.invoke(app, ["one", str(input_path), "--output", str(output_path)])
         assert result.exit_code != 0
 
-    def test_app_processing_error(self, temp_dir, sample_image_bytes):
+    def test_app_processing_error(self, temp_dir, link_sample_image, monkeypatch):
         """Test app function with processing error."""
         input_path = temp_dir / "input.png"
         output_path = temp_dir / "output.png"
 
-        input_path.write_bytes(sample_image_bytes)
-
-        with patch("sprite_processor.cli._process_one") as mock_process_one:
-            mock_process_one.side_effect = Exception("Processing failed")
+        link_sample_image(input_path)
 
-            from click.testing import CliRunner
+        monkeypatch.setattr(
+            _cli_mod, "_process_one", MagicMock(side_effect=Exception("Processing failed"))
+        )
 
-            runner = CliRunner()
-            result = runner.invoke(app, ["one", str(input_path), "--output", str(output_path)])
-            assert result.exit_code != 0
+        result = RUNNER.invoke(app, ["one", str(input_path), "--output", str(output_path)])
+        assert result.exit_code != 0
 
 
 class TestSpritesheetCommand:
     """Test the spritesheet CLI command."""
 
-    def test_spritesheet_command_success(self, temp_dir, sample_image_bytes):
+    def test_spritesheet_command_success(self, temp_dir, link_sample_image, monkeypatch):
         """Test successful spritesheet command execution."""
         input_path = temp_dir / "spritesheet.png"
         output_dir = temp_dir / "output"
         
-        input_path.write_bytes(sample_image_bytes)
+        link_sample_image(input_path)
         output_dir.mkdir()
 
-        with (
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            mock_create_spritesheet.return_value = None
-            mock_process_one.return_value = None
+        monkeypatch.setattr(_cli_mod, "_create_spritesheet", MagicMock(return_value=None))
+        monkeypatch.setattr(_cli_mod, "_process_one", MagicMock(return_value=None))
 
-            from click.testing import CliRunner
-
-            runner = CliRunner()
-            result = runner.invoke(
-                app, ["spritesheet", str(input_path), str(output_dir), "--grid", "2x2"]
-            )
+        result = RUNNER.invoke(
+            app, ["spritesheet", str(input_path), str(output_dir), "--grid", "2x2"]
+        )
 
-            assert result.exit_code == 0
+        assert result.exit_code == 0
 
-    def test_spritesheet_command_invalid_grid(self, temp_dir, sample_image_bytes):
+    def test_spritesheet_command_invalid_grid(self, temp_dir, link_sample_image):
         """Test spritesheet command with invalid grid format."""
         input_path = temp_dir / "spritesheet.png"
         output_dir = temp_dir / "output"
         
-        input_path.write_bytes(sample_image_bytes)
+        link_sample_image(input_path)
         output_dir.mkdir()
 
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(
+        result = RUNNER.invoke(
             app, ["spritesheet", str(input_path), str(output_dir), "--grid", "invalid"]
         )
 
@@ -276,10 +254,7 @@ class TestSpritesheetCommand:
         output_dir = temp_dir / "output"
         output_dir.mkdir()
 
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(
+        result = RUNNER.invoke(
             app, ["spritesheet", "nonexistent.png", str(output_dir), "--grid", "2x2"]
         )
 
@@ -289,37 +264,42 @@ class TestSpritesheetCommand:
 class TestVideoSpritesheetCommand:
     """Test the video-spritesheet CLI command."""
 
-    def test_video_spritesheet_command_success(self, temp_dir, sample_video_file):
+    def test_video_spritesheet_command_success(self, temp_dir, sample_video_file, monkeypatch):
         """Test successful video-spritesheet command execution."""
         output_path = temp_dir / "output.png"
 
-        with (
-            patch("sprite_processor.video.video_to_gif") as mock_video_to_gif,
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-        ):
-            from unittest.mock import MagicMock
-            mock_video_to_gif.return_value = str(temp_dir / "temp.gif")
-            mock_extract_frames.return_value = [MagicMock() for _ in range(4)]
-            mock_create_spritesheet.return_value = output_path
-
-            from click.testing import CliRunner
-
-            runner = CliRunner()
-            result = runner.invoke(
-                app, ["video-spritesheet", str(sample_video_file), "--output", str(output_path), "--grid", "2x2"]
-            )
+        # Every capture property (fps, frame count, width, height) reads as 10
+        mock_capture = MagicMock()
+        mock_capture.return_value.get.return_value = 10.0
+        monkeypatch.setattr(_video_mod.cv2, "VideoCapture", mock_capture)
+        frames = np.zeros((4, 10, 10, 3), dtype=np.uint8)
+        monkeypatch.setattr(_video_mod, "_read_frames_at", MagicMock(return_value=frames))
+        mock_create_spritesheet = MagicMock(return_value=output_path)
+        monkeypatch.setattr(_cli_mod, "_create_spritesheet", mock_create_spritesheet)
+
+        result = RUNNER.invoke(
+            app,
+            [
+                "video-spritesheet",
+                str(sample_video_file),
+                "--output",
+                str(output_path),
+                "--grid",
+                "2x2",
+            ],
+        )
 
-            assert result.exit_code == 0
+        assert result.exit_code == 0
+        mock_create_spritesheet.assert_called_once()
+        args = mock_create_spritesheet.call_args.args
+        assert args[0] is frames
+        assert args[1:] == (2, 2, output_path)
 
     def test_video_spritesheet_command_invalid_grid(self, temp_dir, sample_video_file):
         """Test video-spritesheet command with invalid grid format."""
         output_path = temp_dir / "output.png"
 
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(
+        result = RUNNER.invoke(
             app, ["video-spritesheet", str(sample_video_file), "--output", str(output_path), "--grid", "invalid"]
         )
 
@@ -331,57 +311,56 @@ class TestVideoSpritesheetCommand:
 class TestPipelineCommand:
     """Test the pipeline CLI command."""
 
-    def test_pipeline_command_success(self, temp_dir, sample_video_file):
+    def test_pipeline_command_success(self, temp_dir, sample_video_file, monkeypatch):
         """Test successful pipeline command execution."""
         output_dir = temp_dir / "output"
         output_dir.mkdir()
 
-        with patch("sprite_processor.pipeline.process_video_pipeline") as mock_pipeline:
-            mock_pipeline.return_value = {
+        mock_pipeline = MagicMock(
+            return_value={
                 "gif_path": "test.gif",
                 "spritesheet_path": "test.png",
                 "processed_path": "processed.png",
             }
+        )
+        monkeypatch.setattr(_pipeline_mod, "process_video_pipeline", mock_pipeline)
 
-            from click.testing import CliRunner
-
-            runner = CliRunner()
-            result = runner.invoke(
-                app, ["pipeline", str(sample_video_file), "--output-dir", str(output_dir)]
-            )
+        result = RUNNER.invoke(
+            app, ["pipeline", str(sample_video_file), "--output-dir", str(output_dir)]
+        )
 
-            assert result.exit_code == 0
+        assert result.exit_code == 0
 
-    def test_pipeline_command_all_models(self, temp_dir, sample_video_file):
+    def test_pipeline_command_all_models(self, temp_dir, sample_video_file, monkeypatch):
         """Test pipeline command with all models flag."""
         output_dir = temp_dir / "output"
         output_dir.mkdir()
 
-        with patch("sprite_processor.pipeline.process_video_pipeline_all_models") as mock_pipeline:
-            mock_pipeline.return_value = {
+        mock_pipeline = MagicMock(
+            return_value={
                 "model_results": {
                     "isnet-general-use": {"success": True, "path": "test.png"},
                     "u2net": {"success": True, "path": "test2.png"},
                 }
             }
+        )
+        monkeypatch.setattr(_pipeline_mod, "process_video_pipeline_all_models", mock_pipeline)
 
-            from click.testing import CliRunner
-
-            runner = CliRunner()
-            result = runner.invoke(
-                app, ["pipeline", str(sample_video_file), "--output-dir", str(output_dir), "--all-models"]
-            )
+        result = RUNNER.invoke(
+            app,
+            ["pipeline", str(sample_video_file), "--output-dir", str(output_dir), "--all-models"],
+        )
 
-            assert result.exit_code == 0
+        assert result.exit_code == 0
 
 
 class TestAnalyzeCommand:
     """Test the analyze CLI command."""
 
-    def test_analyze_command_success(self, temp_dir, sample_video_file):
+    def test_analyze_command_success(self, temp_dir, sample_video_file, monkeypatch):
         """Test successful analyze command execution."""
-        with patch("sprite_processor.pipeline.analyze_video_for_pipeline") as mock_analyze:
-            mock_analyze.return_value = {
+        mock_analyze = MagicMock(
+            return_value={
                 "video_analysis": {
                     "duration": 5.0,
                     "fps": 24.0,
@@ -398,21 +377,17 @@ class TestAnalyzeCommand:
                     "estimated_processing_time": "2 minutes",
                 },
             }
+        )
+        monkeypatch.setattr(_pipeline_mod, "analyze_video_for_pipeline", mock_analyze)
 
-            from click.testing import CliRunner
-
-            runner = CliRunner()
-            result = runner.invoke(app, ["analyze", str(sample_video_file)])
+        result = RUNNER.invoke(app, ["analyze", str(sample_video_file)])
 
-            assert result.exit_code == 0
-            assert "Video Analysis" in result.output
+        assert result.exit_code == 0
+        assert "Video Analysis" in result.output
 
     def test_analyze_command_nonexistent_file(self, temp_dir):
         """Test analyze command with non-existent file."""
-        from click.testing import CliRunner
-
-        runner = CliRunner()
-        result = runner.invoke(app, ["analyze", "nonexistent.mp4"])
+        result = RUNNER.invoke(app, ["analyze", "nonexistent.mp4"])
 
         assert result.exit_code != 0
 
@@ -420,80 +395,110 @@ class TestAnalyzeCommand:
 class TestCreateSpritesheet:
     """Test the _create_spritesheet function."""
 
-    def test_create_spritesheet_basic(self, temp_dir):
+    def test_create_spritesheet_basic(self):
         """Test basic spritesheet creation."""
-        from sprite_processor.cli import _create_spritesheet
-        from PIL import Image
+        # _create_spritesheet only reads its frames, so one image can fill every slot
+        frames = [_RED_FRAME] * 4
 
-        # Create test frames
-        frames = []
-        for i in range(4):
-            img = Image.new("RGBA", (32, 32), color=(255, 0, 0, 255))
-            frames.append(img)
+        buffer = io.BytesIO()
+
+        result = _create_spritesheet(frames, 2, 2, buffer)
+
+        assert result is buffer
 
-        output_path = temp_dir / "spritesheet.png"
-        
-        result = _create_spritesheet(frames, 2, 2, output_path)
-        
-        assert result == output_path
-        assert output_path.exists()
-        
         # Verify the spritesheet was created with correct dimensions
-        with Image.open(output_path) as spritesheet:
-            assert spritesheet.size == (64, 64)  # 2x2 grid of 32x32 frames
+        assert _png_size(buffer.getvalue()) == (64, 64)  # 2x2 grid of 32x32 frames
 
-    def test_create_spritesheet_different_sizes(self, temp_dir):
+    def test_create_spritesheet_different_sizes(self):
         """Test spritesheet creation with different frame sizes."""
-        from sprite_processor.cli import _create_spritesheet
-        from PIL import Image
-
         # Create frames of different sizes
-        frames = []
-        for i in range(6):
-            img = Image.new("RGBA", (16, 16), color=(0, 255, 0, 255))
-            frames.append(img)
+        frames = [_GREEN_FRAME_16] * 6
+
+        buffer = io.BytesIO()
+
+        result = _create_spritesheet(frames, 3, 2, buffer)
+
+        assert result is buffer
 
-        output_path = temp_dir / "spritesheet.png"
-        
-        result = _create_spritesheet(frames, 3, 2, output_path)
-        
-        assert result == output_path
-        assert output_path.exists()
-        
         # Verify the spritesheet was created with correct dimensions
-        with Image.open(output_path) as spritesheet:
-            assert spritesheet.size == (48, 32)  # 3x2 grid of 16x16 frames
+        assert _png_size(buffer.getvalue()) == (48, 32)  # 3x2 grid of 16x16 frames
+
+    def test_create_spritesheet_array_frames(self):
+        """Test spritesheet creation from an (N, H, W, 4) frame array."""
+        frames = np.zeros((4, 16, 8, 4), dtype=np.uint8)
+        frames[3] = 255
+
+        buffer = io.BytesIO()
+
+        result = _create_spritesheet(frames, 2, 2, buffer)
+
+        assert result is buffer
+        with Image.open(buffer) as sheet:
+            assert sheet.size == (16, 32)  # 2x2 grid of 8x16 frames
+            assert sheet.getpixel((0, 0)) == (0, 0, 0, 0)
+            assert sheet.getpixel((15, 31)) == (255, 255, 255, 255)
+
+    def test_create_spritesheet_array_matches_image_frames(self):
+        """Test that array and PIL frames tile identically, including a partial last row."""
+        frames = np.arange(5 * 4 * 6 * 4, dtype=np.uint8).reshape(5, 4, 6, 4)
+
+        from_array = io.BytesIO()
+        from_images = io.BytesIO()
+        _create_spritesheet(frames, 3, 2, from_array)
+        _create_spritesheet([Image.fromarray(f) for f in frames], 3, 2, from_images)
+
+        with Image.open(from_array) as a, Image.open(from_images) as b:
+            assert a.size == (18, 8)
+            assert a.tobytes() == b.tobytes()
+
+    @pytest.mark.parametrize("channels", [3, 4])
+    def test_create_spritesheet_parallel_png_matches_pil(self, temp_dir, monkeypatch, channels):
+        """Test that max_workers > 1 compresses strips on a thread pool into the same pixels."""
+        frames = np.arange(6 * 9 * 7 * channels, dtype=np.uint8).reshape(6, 9, 7, channels)
+        executor = MagicMock(wraps=_cli_mod.ThreadPoolExecutor)
+        monkeypatch.setattr(_cli_mod, "ThreadPoolExecutor", executor)
+
+        serial = io.BytesIO()
+        _create_spritesheet(frames, 3, 2, serial)
+        executor.assert_not_called()
+
+        output_path = temp_dir / "parallel.png"
+        result = _create_spritesheet(frames, 3, 2, output_path, max_workers=4)
+
+        assert result == output_path
+        executor.assert_called_once_with(max_workers=4)
+        with Image.open(output_path) as parallel, Image.open(serial) as expected:
+            assert parallel.size == expected.size == (21, 18)
+            assert parallel.mode == expected.mode
+            assert parallel.tobytes() == expected.tobytes()
+
+    def test_create_spritesheet_rejects_non_uint8_array(self):
+        """Test that float frame arrays are rejected rather than cast."""
+        frames = np.zeros((2, 4, 4, 4), dtype=np.float32)
+
+        with pytest.raises(ValueError, match="uint8"):
+            _create_spritesheet(frames, 2, 1, io.BytesIO())
 
     def test_create_spritesheet_empty_frames(self, temp_dir):
         """Test spritesheet creation with empty frames list."""
-        from sprite_processor.cli import _create_spritesheet
-
         output_path = temp_dir / "spritesheet.png"
         
         with pytest.raises(ValueError, match="No frames provided"):
             _create_spritesheet([], 2, 2, output_path)
 
-    def test_create_spritesheet_mismatched_grid(self, temp_dir):
+    def test_create_spritesheet_mismatched_grid(self):
         """Test spritesheet creation with mismatched grid dimensions."""
-        from sprite_processor.cli import _create_spritesheet
-        from PIL import Image
-
         # Create 4 frames but specify 3x3 grid (9 slots)
-        frames = []
-        for i in range(4):
-            img = Image.new("RGBA", (32, 32), color=(0, 0, 255, 255))
-            frames.append(img)
+        frames = [_BLUE_FRAME] * 4
+
+        buffer = io.BytesIO()
 
-        output_path = temp_dir / "spritesheet.png"
-        
         # Should still work, just fill remaining slots with empty frames
-        result = _create_spritesheet(frames, 3, 3, output_path)
-        
-        assert result == output_path
-        assert output_path.exists()
-        
+        result = _create_spritesheet(frames, 3, 3, buffer)
+
+        assert result is buffer
+
         # Verify the spritesheet was created with correct dimensions
-        with Image.open(output_path) as spritesheet:
-            assert spritesheet.size == (96, 96)  # 3x3 grid of 32x32 frames
+        assert _png_size(buffer.getvalue()) == (96, 96)  # 3x3 grid of 32x32 frames
 
 
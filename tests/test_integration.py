@@ -4,6 +4,8 @@ Integration tests for sprite-processor.
 These tests verify that the different components work together correctly.
 """
 
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 import pytest
@@ -12,12 +14,36 @@ from sprite_processor import remove_bytes, remove_file
 from sprite_processor.pipeline import VideoPipelineConfig, process_video_pipeline
 from sprite_processor.video import analyze_video
 
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
 
-class TestEndToEndWorkflows:
-    """Test complete end-to-end workflows."""
+# Generous ceiling for one mocked 64x64 background removal
+_PEAK_MEMORY_LIMIT = 50 * 1024 * 1024
 
 
+class TestEndToEndWorkflows:
+    """Test complete end-to-end workflows."""
 
+    def test_concurrent_processing(self, sample_image_bytes, patched_new_session):
+        """Test remove_bytes from several threads sharing one patched session factory."""
+        # The autouse new_session patch is installed once, outside the workers
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: remove_bytes(sample_image_bytes), range(5)))
+
+        assert len(results) == 5
+        assert all(r.startswith(_PNG_SIG) for r in results)
+        assert patched_new_session.call_count == 5
+
+    @pytest.mark.slow
+    def test_memory_usage(self, sample_image_bytes):
+        """Test that a single remove_bytes call keeps its traced peak allocation bounded."""
+        tracemalloc.start()
+        try:
+            remove_bytes(sample_image_bytes)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < _PEAK_MEMORY_LIMIT
 
     def test_error_handling_workflow(self, temp_dir):
         """Test error handling across the workflow."""
@@ -2,16 +2,36 @@
 Tests for pipeline processing functions.
 """
 
-from unittest.mock import patch
-
+import dataclasses
+import json
+import os
+import re
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
 import pytest
 
+from sprite_processor import cli as _cli_mod
+from sprite_processor import pipeline as _pipeline_mod
 from sprite_processor.pipeline import (
+    ALL_MODELS,
     VideoPipelineConfig,
+    _get_session,
+    clear_model_cache,
+    clear_pipeline_cache,
     process_video_pipeline,
     process_video_pipeline_all_models,
 )
 
+_FRAMES = np.zeros((3, 8, 8, 4), dtype=np.uint8)
+_VIDEO_ERR_RE = re.compile("Video processing failed")
+_SHEET_ERR_RE = re.compile("Spritesheet processing failed")
+
 
 class TestVideoPipelineConfig:
     """Test the VideoPipelineConfig class."""
@@ -45,166 +65,432 @@ class TestVideoPipelineConfig:
         assert config.grid == "5x2"
         assert config.frames is None
         assert config.model == "isnet-general-use"
+        assert config.max_workers is None
+
+    def test_config_hashable(self):
+        """Test that equal configs hash equally and are immutable."""
+        config = VideoPipelineConfig(fps=12, grid="4x2")
+        config2 = VideoPipelineConfig(fps=12, grid="4x2")
+
+        assert config == config2
+        assert hash(config) == hash(config2)
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            config.fps = 24
+
+
+# Built once per module and reset for each test by mock_pipeline_deps
+_PIPELINE_MOCKS = SimpleNamespace(
+    video_to_gif=MagicMock(),
+    extract_frames=MagicMock(),
+    create_spritesheet=MagicMock(),
+    process_one=MagicMock(),
+    get_session=MagicMock(),
+    remove=MagicMock(),
+)
 
 
-class TestProcessVideoPipeline:
-    """Test the process_video_pipeline function."""
+@pytest.fixture
+def mock_pipeline_deps(monkeypatch):
+    """Replace the pipeline's video, spritesheet and rembg helpers with mocks.
+
+    Returns a namespace of the installed mocks, reset to their defaults, so
+    tests only configure the ``return_value``/``side_effect`` they care about.
+    """
+    mocks = _PIPELINE_MOCKS
+    for mock in vars(mocks).values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    mocks.extract_frames.return_value = _FRAMES
+    mocks.create_spritesheet.return_value = None
+    mocks.remove.return_value = b"processed"
+
+    monkeypatch.setattr(_pipeline_mod, "video_to_gif", mocks.video_to_gif)
+    monkeypatch.setattr(_pipeline_mod, "extract_gif_frames_array", mocks.extract_frames)
+    monkeypatch.setattr(_pipeline_mod, "_get_session", mocks.get_session)
+    monkeypatch.setattr(_pipeline_mod, "remove", mocks.remove)
+    monkeypatch.setattr(_cli_mod, "_create_spritesheet", mocks.create_spritesheet)
+    monkeypatch.setattr(_cli_mod, "_process_one", mocks.process_one)
+    return mocks
+
+
+@pytest.fixture
+def pipeline_paths(temp_dir):
+    """Create the pipeline output directory and pre-build the paths it writes to."""
+    out = temp_dir / "output"
+    out.mkdir()
+    return SimpleNamespace(
+        out=out,
+        gif=out / "test_video.gif",
+        sheet=out / "test_video_spritesheet.png",
+        model={m: out / f"test_video_{m}_processed.png" for m in ALL_MODELS},
+        manifest=out / "test_video_results.json",
+    )
 
 
+class TestProcessVideoPipeline:
+    """Test the process_video_pipeline function."""
 
-    def test_process_video_pipeline_video_error(self, temp_dir, sample_video_file):
+    def test_process_video_pipeline_video_error(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
         """Test video pipeline processing with video processing error."""
-        output_dir = temp_dir / "output"
-        output_dir.mkdir()
+        output_dir = pipeline_paths.out
 
-        with patch("sprite_processor.pipeline.video_to_gif") as mock_video_to_gif:
-            mock_video_to_gif.side_effect = Exception("Video processing failed")
+        mock_pipeline_deps.video_to_gif.side_effect = Exception("Video processing failed")
 
-            config = VideoPipelineConfig()
+        config = VideoPipelineConfig()
 
-            # The pipeline raises exceptions on error, doesn't return success=False
-            with pytest.raises(Exception, match="Video processing failed"):
-                process_video_pipeline(str(sample_video_file), str(output_dir), config)
+        # The pipeline raises exceptions on error, doesn't return success=False
+        with pytest.raises(Exception, match=_VIDEO_ERR_RE):
+            process_video_pipeline(str(sample_video_file), str(output_dir), config)
 
-    def test_process_video_pipeline_spritesheet_error(self, temp_dir, sample_video_file):
+    def test_process_video_pipeline_spritesheet_error(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
         """Test video pipeline processing with spritesheet processing error."""
-        output_dir = temp_dir / "output"
-        output_dir.mkdir()
+        output_dir = pipeline_paths.out
+
+        mock_pipeline_deps.video_to_gif.return_value = str(pipeline_paths.gif)
+        mock_pipeline_deps.create_spritesheet.side_effect = Exception(
+            "Spritesheet processing failed"
+        )
+
+        config = VideoPipelineConfig(grid="5x2")
 
-        with (
-            patch("sprite_processor.pipeline.video_to_gif") as mock_video_to_gif,
-            patch("sprite_processor.pipeline.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-        ):
+        # The pipeline raises exceptions on error, doesn't return success=False
+        with pytest.raises(Exception, match=_SHEET_ERR_RE):
+            process_video_pipeline(str(sample_video_file), str(output_dir), config)
 
-            mock_video_to_gif.return_value = str(output_dir / "output.gif")
-            mock_extract_frames.return_value = [b"frame1", b"frame2", b"frame3"]
-            mock_create_spritesheet.side_effect = Exception("Spritesheet processing failed")
 
-            config = VideoPipelineConfig(grid="5x2")
+class TestProcessVideoPipelineCache:
+    """Test the opt-in result cache of process_video_pipeline."""
 
-            # The pipeline raises exceptions on error, doesn't return success=False
-            with pytest.raises(Exception, match="Spritesheet processing failed"):
-                process_video_pipeline(str(sample_video_file), str(output_dir), config)
+    def test_process_video_pipeline_use_cache(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
+        """Test that an identical second run is served from the cache."""
+        output_dir = pipeline_paths.out
+        clear_pipeline_cache()
+
+        process_one = mock_pipeline_deps.process_one
+        process_one.side_effect = lambda src, dst, model_name: dst.write_bytes(b"out")
+
+        config = VideoPipelineConfig(grid="3x1")
+        first = process_video_pipeline(sample_video_file, output_dir, config, use_cache=True)
+        second = process_video_pipeline(
+            sample_video_file, output_dir, VideoPipelineConfig(grid="3x1"), use_cache=True
+        )
+
+        assert len(_pipeline_mod._PIPELINE_CACHE) == 1
+        assert mock_pipeline_deps.video_to_gif.call_count == 1
+        assert second == first
+        clear_pipeline_cache()
+
+    def test_process_video_pipeline_cache_normalizes_paths(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps, monkeypatch
+    ):
+        """Test that relative and absolute spellings of the same video share an entry."""
+        clear_pipeline_cache()
+        process_one = mock_pipeline_deps.process_one
+        process_one.side_effect = lambda src, dst, model_name: dst.write_bytes(b"out")
+        monkeypatch.chdir(sample_video_file.parent)
+
+        config = VideoPipelineConfig(grid="3x1")
+        process_video_pipeline(sample_video_file.name, pipeline_paths.out, config, use_cache=True)
+        process_video_pipeline(sample_video_file, pipeline_paths.out, config, use_cache=True)
+
+        assert mock_pipeline_deps.video_to_gif.call_count == 1
+        clear_pipeline_cache()
+
+    def test_process_video_pipeline_stale_entry_keeps_others(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
+        """Test that a removed output reruns only its own entry."""
+        clear_pipeline_cache()
+        process_one = mock_pipeline_deps.process_one
+        process_one.side_effect = lambda src, dst, model_name: dst.write_bytes(b"out")
+
+        config = VideoPipelineConfig(grid="3x1")
+        out_a, out_b = pipeline_paths.out / "a", pipeline_paths.out / "b"
+        first_a = process_video_pipeline(sample_video_file, out_a, config, use_cache=True)
+        process_video_pipeline(sample_video_file, out_b, config, use_cache=True)
+        assert mock_pipeline_deps.video_to_gif.call_count == 2
+
+        first_a["processed_path"].unlink()
+        process_video_pipeline(sample_video_file, out_a, config, use_cache=True)
+        assert mock_pipeline_deps.video_to_gif.call_count == 3
+        assert first_a["processed_path"].exists()
+        # The rerun replaced out_a's entry rather than adding another
+        assert len(_pipeline_mod._PIPELINE_CACHE) == 2
+
+        # The other entry is still served from the cache
+        process_video_pipeline(sample_video_file, out_b, config, use_cache=True)
+        assert mock_pipeline_deps.video_to_gif.call_count == 3
+        clear_pipeline_cache()
+
+    def test_process_video_pipeline_cache_evicts_least_recently_used(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps, monkeypatch
+    ):
+        """Test that the cache stays bounded by dropping its least recently used entry."""
+        monkeypatch.setattr(_pipeline_mod, "_PIPELINE_CACHE_SIZE", 2)
+        clear_pipeline_cache()
+        process_one = mock_pipeline_deps.process_one
+        process_one.side_effect = lambda src, dst, model_name: dst.write_bytes(b"out")
+
+        config = VideoPipelineConfig(grid="3x1")
+        out_a, out_b, out_c = (pipeline_paths.out / name for name in "abc")
+        process_video_pipeline(sample_video_file, out_a, config, use_cache=True)
+        process_video_pipeline(sample_video_file, out_b, config, use_cache=True)
+        process_video_pipeline(sample_video_file, out_a, config, use_cache=True)  # a is now newest
+        process_video_pipeline(sample_video_file, out_c, config, use_cache=True)  # evicts b
+        assert len(_pipeline_mod._PIPELINE_CACHE) == 2
+        assert mock_pipeline_deps.video_to_gif.call_count == 3
+
+        process_video_pipeline(sample_video_file, out_a, config, use_cache=True)
+        assert mock_pipeline_deps.video_to_gif.call_count == 3
+        process_video_pipeline(sample_video_file, out_b, config, use_cache=True)
+        assert mock_pipeline_deps.video_to_gif.call_count == 4
+        clear_pipeline_cache()
 
 
 class TestProcessVideoPipelineAllModels:
     """Test the process_video_pipeline_all_models function."""
 
-    def test_process_video_pipeline_all_models_success(self, temp_dir, sample_video_file):
+    def test_process_video_pipeline_all_models_success(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
         """Test successful video pipeline processing with all models."""
-        output_dir = temp_dir / "output"
-        output_dir.mkdir()
-
-        with (
-            patch("sprite_processor.pipeline.video_to_gif") as mock_video_to_gif,
-            patch("sprite_processor.pipeline.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            # Mock the video processing functions
-            mock_video_to_gif.return_value = str(output_dir / "output.gif")
-            mock_extract_frames.return_value = [b"frame1", b"frame2", b"frame3"]
-            mock_create_spritesheet.return_value = None
-            mock_process_one.return_value = None
-
-            # Create actual files that the pipeline expects
-            (output_dir / "test_video.gif").touch()
-            (output_dir / "test_video_spritesheet.png").touch()
-            # Create files for each model
-            for model in ["isnet-general-use", "u2net_human_seg", "u2net", "u2netp", "u2net_cloth_seg", "silueta"]:
-                (output_dir / f"test_video_{model}_processed.png").touch()
-
-            config = VideoPipelineConfig(
-                fps=10, duration=5.0, max_width=480, max_height=480, grid="5x2"
-            )
+        output_dir = pipeline_paths.out
 
-            result = process_video_pipeline_all_models(
-                str(sample_video_file), str(output_dir), config
-            )
+        mock_pipeline_deps.video_to_gif.return_value = str(pipeline_paths.gif)
+
+        # Create actual files that the pipeline expects
+        pipeline_paths.gif.touch()
+        pipeline_paths.sheet.write_bytes(b"sheet")
+
+        config = VideoPipelineConfig(
+            fps=10, duration=5.0, max_width=480, max_height=480, grid="5x2"
+        )
+
+        result = process_video_pipeline_all_models(str(sample_video_file), str(output_dir), config)
 
-            assert "model_results" in result
-            assert len(result["model_results"]) > 0  # Should have results for multiple models
+        assert "model_results" in result
+        # One result per model, in ALL_MODELS order
+        assert tuple(result["model_results"]) == ALL_MODELS
 
-            # Check that each model was processed
-            for model_name, model_result in result["model_results"].items():
-                assert model_result["success"] is True
-                assert "path" in model_result
+        # Check that each model was processed
+        model_results = result["model_results"].values()
+        assert all(r["success"] is True and "path" in r for r in model_results)
+        assert {m: r["path"] for m, r in result["model_results"].items()} == pipeline_paths.model
 
-    def test_process_video_pipeline_all_models_partial_failure(self, temp_dir, sample_video_file):
+        # The manifest records the same per-model outcome
+        assert result["manifest_path"] == pipeline_paths.manifest
+        manifest = json.loads(pipeline_paths.manifest.read_text())
+        assert manifest == {
+            m: {"path": str(path), "success": True, "size": path.stat().st_size}
+            for m, path in pipeline_paths.model.items()
+        }
+
+        # The spritesheet is read once and every model gets the same bytes
+        assert mock_pipeline_deps.get_session.call_count == len(result["model_results"])
+        assert all(c.args[0] == b"sheet" for c in mock_pipeline_deps.remove.call_args_list)
+
+    def test_process_video_pipeline_all_models_partial_failure(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
         """Test video pipeline processing with some models failing."""
-        output_dir = temp_dir / "output"
-        output_dir.mkdir()
+        output_dir = pipeline_paths.out
 
-        def mock_process_one_side_effect(input_path, output_path, model_name):
-            if model_name == "isnet-general-use":
+        def mock_remove_side_effect(data, session):
+            if session == "isnet-general-use":
                 # Success for this model
-                return None
+                return b"processed"
             else:
                 # Failure for other models
-                raise Exception(f"Processing failed for {model_name}")
-
-        with (
-            patch("sprite_processor.pipeline.video_to_gif") as mock_video_to_gif,
-            patch("sprite_processor.pipeline.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            # Mock the video processing functions
-            mock_video_to_gif.return_value = str(output_dir / "output.gif")
-            mock_extract_frames.return_value = [b"frame1", b"frame2", b"frame3"]
-            mock_create_spritesheet.return_value = None
-            mock_process_one.side_effect = mock_process_one_side_effect
-
-            # Create actual files that the pipeline expects
-            (output_dir / "test_video.gif").touch()
-            (output_dir / "test_video_spritesheet.png").touch()
-            # Create files for the successful model only
-            (output_dir / "test_video_isnet-general-use_processed.png").touch()
-
-            config = VideoPipelineConfig(grid="5x2")
-
-            result = process_video_pipeline_all_models(
-                str(sample_video_file), str(output_dir), config
-            )
+                raise Exception(f"Processing failed for {session}")
+
+        mock_pipeline_deps.video_to_gif.return_value = str(pipeline_paths.gif)
+        mock_pipeline_deps.get_session.side_effect = lambda model: model
+        mock_pipeline_deps.remove.side_effect = mock_remove_side_effect
+
+        # Create actual files that the pipeline expects
+        pipeline_paths.gif.touch()
+        pipeline_paths.sheet.write_bytes(b"sheet")
+
+        config = VideoPipelineConfig(grid="5x2")
+
+        result = process_video_pipeline_all_models(str(sample_video_file), str(output_dir), config)
+
+        assert "model_results" in result
+
+        # Check that we have both successful and failed results
+        success_count = sum(1 for r in result["model_results"].values() if r["success"])
+        failure_count = sum(1 for r in result["model_results"].values() if not r["success"])
+
+        assert success_count > 0
+        assert failure_count > 0
+
+    @pytest.mark.parametrize("failing_model", ALL_MODELS)
+    def test_process_video_pipeline_all_models_single_failure(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps, failing_model
+    ):
+        """Test that one model failing does not affect the other models' results."""
 
-            assert "model_results" in result
+        def mock_remove_side_effect(data, session):
+            if session == failing_model:
+                raise Exception(f"Processing failed for {session}")
+            return b"processed"
 
-            # Check that we have both successful and failed results
-            success_count = sum(1 for r in result["model_results"].values() if r["success"])
-            failure_count = sum(1 for r in result["model_results"].values() if not r["success"])
+        mock_pipeline_deps.get_session.side_effect = lambda model: model
+        mock_pipeline_deps.remove.side_effect = mock_remove_side_effect
 
-            assert success_count > 0
-            assert failure_count > 0
+        pipeline_paths.sheet.write_bytes(b"sheet")
 
-    def test_process_video_pipeline_all_models_all_fail(self, temp_dir, sample_video_file):
+        result = process_video_pipeline_all_models(
+            str(sample_video_file), str(pipeline_paths.out), VideoPipelineConfig(grid="5x2")
+        )
+
+        failed = [m for m, r in result["model_results"].items() if not r["success"]]
+        assert failed == [failing_model]
+        assert failing_model in result["model_results"][failing_model]["error"]
+        assert not pipeline_paths.model[failing_model].exists()
+
+    def test_process_video_pipeline_all_models_all_fail(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
         """Test video pipeline processing when all models fail."""
-        output_dir = temp_dir / "output"
-        output_dir.mkdir()
-
-        with (
-            patch("sprite_processor.pipeline.video_to_gif") as mock_video_to_gif,
-            patch("sprite_processor.pipeline.extract_gif_frames") as mock_extract_frames,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-            patch("sprite_processor.cli._process_one") as mock_process_one,
-        ):
-            # Mock the video processing functions
-            mock_video_to_gif.return_value = str(output_dir / "output.gif")
-            mock_extract_frames.return_value = [b"frame1", b"frame2", b"frame3"]
-            mock_create_spritesheet.return_value = None
-            mock_process_one.side_effect = Exception("All models failed")
-
-            config = VideoPipelineConfig(grid="5x2")
-
-            result = process_video_pipeline_all_models(
-                str(sample_video_file), str(output_dir), config
+        output_dir = pipeline_paths.out
+
+        mock_pipeline_deps.video_to_gif.return_value = str(pipeline_paths.gif)
+        mock_pipeline_deps.remove.side_effect = Exception("All models failed")
+
+        pipeline_paths.sheet.write_bytes(b"sheet")
+
+        config = VideoPipelineConfig(grid="5x2")
+
+        result = process_video_pipeline_all_models(str(sample_video_file), str(output_dir), config)
+
+        assert "model_results" in result
+        # All models should have failed
+        model_results = result["model_results"].values()
+        assert all(r["success"] is False and "error" in r for r in model_results)
+
+        manifest = json.loads(pipeline_paths.manifest.read_text())
+        assert all(r["success"] is False for r in manifest.values())
+        assert list(pipeline_paths.out.glob("*.tmp")) == []
+
+    @pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+    def test_process_video_pipeline_all_models_manifest_mode(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps
+    ):
+        """Test that the manifest gets the same umask-based mode as the other outputs."""
+        pipeline_paths.sheet.write_bytes(b"sheet")
+        old_umask = os.umask(0o022)
+        try:
+            process_video_pipeline_all_models(
+                str(sample_video_file), str(pipeline_paths.out), VideoPipelineConfig(grid="5x2")
+            )
+        finally:
+            os.umask(old_umask)
+
+        assert stat.S_IMODE(pipeline_paths.manifest.stat().st_mode) == 0o644
+
+
+class TestModelSessionCache:
+    """Test the rembg session cache used by the all-models pipeline."""
+
+    def test_session_created_once_per_model(self):
+        """Test that repeated lookups reuse one session per distinct model."""
+        clear_model_cache()
+        try:
+            with patch("sprite_processor.pipeline.new_session") as mock_new_session:
+                mock_new_session.side_effect = lambda model: object()
+
+                first = [_get_session(m) for m in ("u2net", "silueta", "u2net")]
+                second = [_get_session(m) for m in ("u2net", "silueta")]
+
+            assert mock_new_session.call_count == 2
+            assert first[0] is first[2] is second[0]
+            assert first[1] is second[1]
+        finally:
+            clear_model_cache()
+
+    def test_session_created_once_under_concurrency(self):
+        """Test that threads racing on a cold model load it only once."""
+        clear_model_cache()
+        barrier = threading.Barrier(4)
+        try:
+            with patch("sprite_processor.pipeline.new_session") as mock_new_session:
+
+                def slow_new_session(model):
+                    time.sleep(0.05)  # widen the race window
+                    return object()
+
+                mock_new_session.side_effect = slow_new_session
+
+                def lookup(_):
+                    barrier.wait()
+                    return _get_session("u2net")
+
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    sessions = list(executor.map(lookup, range(4)))
+
+            assert mock_new_session.call_count == 1
+            assert all(session is sessions[0] for session in sessions)
+        finally:
+            clear_model_cache()
+
+    @pytest.mark.parametrize("release_models", [False, True])
+    def test_all_models_run_releases_only_its_sessions(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps, monkeypatch, release_models
+    ):
+        """Test that release_models frees only the sessions the run itself loaded."""
+        monkeypatch.setattr(_pipeline_mod, "_get_session", _get_session)
+        preloaded = object()
+        monkeypatch.setattr(_pipeline_mod, "_SESSION_CACHE", {"u2net": preloaded})
+        pipeline_paths.sheet.write_bytes(b"sheet")
+
+        config = VideoPipelineConfig(grid="5x2", release_models=release_models)
+        with patch("sprite_processor.pipeline.new_session"):
+            process_video_pipeline_all_models(
+                str(sample_video_file), str(pipeline_paths.out), config
             )
 
-            assert "model_results" in result
-            # All models should have failed
-            for model_name, model_result in result["model_results"].items():
-                assert model_result["success"] is False
-                assert "error" in model_result
+        expected = {"u2net"} if release_models else set(ALL_MODELS)
+        assert set(_pipeline_mod._SESSION_CACHE) == expected
+        assert _pipeline_mod._SESSION_CACHE["u2net"] is preloaded
+
+    def test_consecutive_all_models_runs_reuse_sessions(
+        self, pipeline_paths, sample_video_file, mock_pipeline_deps, monkeypatch
+    ):
+        """Test that two all-models runs in a row create each model's session once."""
+        monkeypatch.setattr(_pipeline_mod, "_get_session", _get_session)
+        monkeypatch.setattr(_pipeline_mod, "_SESSION_CACHE", {})
+        config = VideoPipelineConfig(grid="5x2")
+
+        with patch("sprite_processor.pipeline.new_session") as mock_new_session:
+            for _ in range(2):
+                pipeline_paths.sheet.write_bytes(b"sheet")
+                result = process_video_pipeline_all_models(
+                    str(sample_video_file), str(pipeline_paths.out), config
+                )
+                assert all(r["success"] for r in result["model_results"].values())
+                for path in pipeline_paths.model.values():
+                    path.unlink()
+
+        assert sorted(c.args[0] for c in mock_new_session.call_args_list) == sorted(ALL_MODELS)
+
+    def test_clear_model_cache(self):
+        """Test that clearing the cache forces a new session on next use."""
+        clear_model_cache()
+        try:
+            with patch("sprite_processor.pipeline.new_session") as mock_new_session:
+                _get_session("u2net")
+                clear_model_cache()
+                _get_session("u2net")
+
+            assert mock_new_session.call_count == 2
+        finally:
+            clear_model_cache()
 
 
 class TestVideoPipelineConfigValidation:
@@ -2,28 +2,49 @@
 Tests for video processing functions.
 """
 
+from collections.abc import Iterator
 from unittest.mock import MagicMock, patch
 
+import cv2
+import numpy as np
 import pytest
+from PIL import Image
 
-from sprite_processor.video import analyze_video, video_to_gif, video_to_spritesheet
+from sprite_processor.video import (
+    _analyze_video_cached,
+    analyze_video,
+    extract_gif_frames,
+    extract_gif_frames_array,
+    extract_gif_frames_to_dir,
+    iter_gif_frames,
+    produce_outputs,
+    video_to_gif,
+    video_to_spritesheet,
+)
 
 
 class TestVideoToGif:
     """Test the video_to_gif function."""
 
+    @pytest.fixture(autouse=True)
+    def probe(self):
+        """Stub the ffmpeg size probe; tests override ``video_size`` as needed."""
+        with patch("sprite_processor.video.ffmpeg_parse_infos") as mock_probe:
+            mock_probe.return_value = {"video_size": [64, 64]}
+            yield mock_probe
 
-    def test_video_to_gif_with_resize(self, temp_dir, sample_video_file):
-        """Test video to GIF conversion with resizing."""
+    def test_video_to_gif_with_resize(self, temp_dir, sample_video_file, probe):
+        """Test that oversized videos are scaled by ffmpeg while decoding."""
         output_path = temp_dir / "output.gif"
+        probe.return_value = {"video_size": [1920, 1080]}  # Large video
 
         with patch("sprite_processor.video.VideoFileClip") as mock_clip:
             mock_video = MagicMock()
             mock_video.duration = 5.0
             mock_video.fps = 24.0
-            mock_video.size = (1920, 1080)  # Large video
-            mock_video.w = 1920
-            mock_video.h = 1080
+            mock_video.size = (640, 360)  # already scaled by the reader
+            mock_video.w = 640
+            mock_video.h = 360
             mock_video.resize.return_value = mock_video
             mock_video.subclip.return_value = mock_video
             mock_video.write_gif.return_value = None
@@ -38,8 +59,53 @@ class TestVideoToGif:
                 str(sample_video_file), str(output_path), fps=15, max_width=640, max_height=480
             )
 
-            # Should call resize with the correct dimensions
-            mock_video.resize.assert_called_once()
+            # ffmpeg scales to fit 640x480 (target_resolution is height, width); no Python resize
+            mock_clip.assert_called_once_with(
+                str(sample_video_file),
+                audio=False,
+                target_resolution=(360, 640),
+                resize_algorithm="area",
+            )
+            mock_video.resize.assert_not_called()
+
+    def test_video_to_gif_skips_audio(self, temp_dir, sample_video_file):
+        """Test that the clip is opened without its audio track."""
+        output_path = temp_dir / "output.gif"
+        output_path.write_bytes(b"dummy gif content")
+
+        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
+            mock_clip.return_value.__enter__.return_value = _mock_clip(1.0, 24.0, (64, 64))
+
+            video_to_gif(sample_video_file, output_path)
+
+            mock_clip.assert_called_once_with(str(sample_video_file), audio=False)
+
+    def test_video_to_gif_mp4_output(self, temp_dir, sample_video_file):
+        """Test that output_format="mp4" encodes with libx264 instead of writing a GIF."""
+        output_path = temp_dir / "output.mp4"
+        output_path.write_bytes(b"dummy mp4 content")
+
+        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
+            mock_video = _mock_clip(1.0, 24.0, (64, 64))
+            mock_clip.return_value.__enter__.return_value = mock_video
+
+            result = video_to_gif(sample_video_file, output_path, fps=12, output_format="mp4")
+
+            assert result == output_path
+            mock_video.write_gif.assert_not_called()
+            mock_video.write_videofile.assert_called_once()
+            kwargs = mock_video.write_videofile.call_args.kwargs
+            assert kwargs["codec"] == "libx264"
+            assert kwargs["fps"] == 12
+            assert "yuv420p" in kwargs["ffmpeg_params"]
+
+    def test_video_to_gif_invalid_output_format(self, temp_dir, sample_video_file):
+        """Test that an unknown output format is rejected before decoding."""
+        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
+            with pytest.raises(ValueError, match="Unsupported output format"):
+                video_to_gif(sample_video_file, temp_dir / "out.webm", output_format="webm")
+
+            mock_clip.assert_not_called()
 
     def test_video_to_gif_no_duration_limit(self, temp_dir, sample_video_file):
         """Test video to GIF conversion without duration limit."""
@@ -77,58 +143,67 @@ class TestVideoToGif:
             video_to_gif("nonexistent.mp4", str(output_path))
 
 
+def _mock_clip(duration, fps, size):
+    """Build a VideoFileClip mock of ``duration`` seconds at ``fps`` and ``size``."""
+    mock_video = MagicMock()
+    mock_video.duration = duration
+    mock_video.fps = fps
+    mock_video.size = size
+    mock_video.w, mock_video.h = size
+    mock_video.resize.return_value = mock_video
+    mock_video.set_end.return_value = mock_video
+    return mock_video
+
+
+def _mock_capture(duration, fps, size, frame_count=None):
+    """Build a cv2.VideoCapture mock over ``duration * fps`` frames; frame i is filled with i.
+
+    ``frame_count`` overrides the reported CAP_PROP_FRAME_COUNT (e.g. a streamed WebM).
+    """
+    count = int(duration * fps)
+    width, height = size
+    props = {
+        cv2.CAP_PROP_FPS: fps,
+        cv2.CAP_PROP_FRAME_COUNT: count if frame_count is None else frame_count,
+        cv2.CAP_PROP_FRAME_WIDTH: width,
+        cv2.CAP_PROP_FRAME_HEIGHT: height,
+    }
+    position = [-1]
+
+    def grab():
+        if position[0] + 1 >= count:
+            return False
+        position[0] += 1
+        return True
+
+    cap = MagicMock()
+    cap.isOpened.return_value = True
+    cap.get.side_effect = props.get
+    cap.grab.side_effect = grab
+    cap.retrieve.side_effect = lambda: (
+        True,
+        np.full((height, width, 3), position[0] % 256, dtype=np.uint8),
+    )
+    return cap
+
+
 class TestVideoToSpritesheet:
     """Test the video_to_spritesheet function."""
 
-
     def test_video_to_spritesheet_auto_grid(self, temp_dir, sample_video_file):
         """Test video to spritesheet with automatic grid calculation."""
         output_path = temp_dir / "output.png"
 
         with (
-            patch("sprite_processor.video.VideoFileClip") as mock_clip,
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract,
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
             patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
         ):
-            mock_video = MagicMock()
-            mock_video.duration = 5.0
-            mock_video.fps = 24.0
-            mock_video.size = (1280, 720)
-            mock_video.w = 1280
-            mock_video.h = 720
-            mock_video.resize.return_value = mock_video
-            mock_video.subclip.return_value = mock_video
-            mock_video.write_gif.return_value = None
-            mock_video.set_end.return_value = mock_video
-
-            # Mock 12 frames
-            mock_frames = [MagicMock() for _ in range(12)]
-            mock_video.iter_frames.return_value = mock_frames
-
-            mock_clip.return_value.__enter__.return_value = mock_video
-
-            # Mock the extracted frames
-            mock_frames = []
-            for i in range(12):
-                mock_frame = MagicMock()
-                mock_frame.size = (640, 360)
-                mock_frames.append(mock_frame)
-            mock_extract.return_value = mock_frames
+            cap = _mock_capture(5.0, 24.0, (1280, 720))
+            mock_capture.return_value = cap
 
             # Mock the spritesheet creation
             mock_create_spritesheet.return_value = output_path
 
-            with patch("sprite_processor.video.Image") as mock_image:
-                mock_img = MagicMock()
-                mock_img.size = (640, 360)
-                mock_image.new.return_value = mock_img
-                mock_image.open.return_value = mock_img
-
-            # Create dummy output files
-            temp_gif = temp_dir / "temp.gif"
-            temp_gif.write_bytes(b"dummy gif content")
-            output_path.write_bytes(b"dummy png content")
-
             video_to_spritesheet(
                 str(sample_video_file),
                 str(output_path),
@@ -140,20 +215,145 @@ class TestVideoToSpritesheet:
             )
 
             mock_create_spritesheet.assert_called_once()
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames.shape == (12, 360, 640, 4)
+            mock_capture.assert_called_once_with(str(sample_video_file))
+            cap.release.assert_called_once()
+
+            # One sequential pass: skipped frames are grabbed, only sampled ones retrieved,
+            # and nothing seeks or reads past the 2s trim
+            cap.set.assert_not_called()
+            assert cap.retrieve.call_count == 12
+            assert cap.grab.call_count <= 48
+
+    def test_video_to_spritesheet_samples_evenly_in_order(self, temp_dir, sample_video_file):
+        """Test that frames are picked evenly across the clip and kept in order."""
+        output_path = temp_dir / "output.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
+        ):
+            # 20 source frames; frame i is filled with the value i
+            mock_capture.return_value = _mock_capture(2.0, 10.0, (8, 8))
+
+            video_to_spritesheet(str(sample_video_file), str(output_path), grid="5x1", fps=10)
+
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames[:, 0, 0, 0].tolist() == [0, 5, 10, 14, 19]
+            # 8-bit end to end: no float intermediates between decode and tiling
+            assert frames.dtype == np.uint8
+
+    def test_video_to_spritesheet_maps_fps_to_source_frames(self, temp_dir, sample_video_file):
+        """Test that samples at the requested fps land on the matching source frames."""
+        output_path = temp_dir / "output.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
+        ):
+            # 1s at 30fps sampled at 10fps -> every third source frame
+            mock_capture.return_value = _mock_capture(1.0, 30.0, (8, 8))
+
+            video_to_spritesheet(
+                str(sample_video_file), str(output_path), grid="4x1", fps=10, sample_evenly=False
+            )
+
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames[:, 0, 0, 0].tolist() == [0, 3, 6, 9]
+
+    def test_video_to_spritesheet_pads_with_last_frame(self, temp_dir, sample_video_file):
+        """Test that a short clip fills the grid by repeating its last frame."""
+        output_path = temp_dir / "output.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
+        ):
+            # 0.5s at 4fps -> only 2 samples for a 2x2 grid
+            mock_capture.return_value = _mock_capture(0.5, 4.0, (8, 8))
+
+            video_to_spritesheet(str(sample_video_file), str(output_path), grid="2x2", fps=4)
+
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames[:, 0, 0, 0].tolist() == [0, 1, 1, 1]
+
+    @pytest.mark.parametrize("frame_count", [0, -2.8e17, float("nan")])
+    def test_video_to_spritesheet_unknown_frame_count(
+        self, temp_dir, sample_video_file, frame_count
+    ):
+        """Test that a missing frame count falls back to ffmpeg's duration."""
+        output_path = temp_dir / "output.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.video.ffmpeg_parse_infos") as mock_probe,
+            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
+        ):
+            mock_capture.return_value = _mock_capture(2.0, 10.0, (8, 8), frame_count=frame_count)
+            mock_probe.return_value = {"duration": 2.0}
+
+            video_to_spritesheet(str(sample_video_file), str(output_path), grid="5x1", fps=10)
+
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames[:, 0, 0, 0].tolist() == [0, 5, 10, 14, 19]
+
+    def test_video_to_spritesheet_counts_frames_without_duration(self, temp_dir, sample_video_file):
+        """Test that frames are counted when neither OpenCV nor ffmpeg knows the length."""
+        output_path = temp_dir / "output.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.video.ffmpeg_parse_infos") as mock_probe,
+            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
+        ):
+            # One capture to decode, one to count frames
+            mock_capture.side_effect = [
+                _mock_capture(2.0, 10.0, (8, 8), frame_count=-1),
+                _mock_capture(2.0, 10.0, (8, 8), frame_count=-1),
+            ]
+            mock_probe.side_effect = OSError("failed to read the duration")
+
+            video_to_spritesheet(str(sample_video_file), str(output_path), grid="5x1", fps=10)
+
+            frames = mock_create_spritesheet.call_args.args[0]
+            assert frames[:, 0, 0, 0].tolist() == [0, 5, 10, 14, 19]
+            assert mock_capture.call_count == 2
+
+    def test_video_to_spritesheet_unreadable_video(self, temp_dir, sample_video_file):
+        """Test that a video OpenCV cannot open is reported as a ValueError."""
+        with patch("sprite_processor.video.cv2.VideoCapture") as mock_capture:
+            mock_capture.return_value.isOpened.return_value = False
+
+            with pytest.raises(ValueError, match="Could not open video"):
+                video_to_spritesheet(sample_video_file, temp_dir / "out.png", "2x2")
+
+            mock_capture.return_value.release.assert_called_once()
+
+    def test_video_to_spritesheet_nonexistent_file(self, missing_dir):
+        """Test video_to_spritesheet with non-existent file."""
+        with pytest.raises(FileNotFoundError):
+            video_to_spritesheet(missing_dir / "nonexistent.mp4", missing_dir / "out.png", "2x2")
 
 
 class TestAnalyzeVideo:
     """Test the analyze_video function."""
 
+    @pytest.fixture(autouse=True)
+    def _clear_analyze_cache(self):
+        """Each test probes sample_video_file with its own canned metadata."""
+        _analyze_video_cached.cache_clear()
+        yield
+        _analyze_video_cached.cache_clear()
+
     def test_analyze_video_basic(self, temp_dir, sample_video_file):
         """Test basic video analysis."""
-        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
-            mock_video = MagicMock()
-            mock_video.duration = 5.0
-            mock_video.fps = 24.0
-            mock_video.size = (1280, 720)
-
-            mock_clip.return_value.__enter__.return_value = mock_video
+        with patch("sprite_processor.video.ffmpeg_parse_infos") as mock_infos:
+            mock_infos.return_value = {
+                "duration": 5.0,
+                "video_fps": 24.0,
+                "video_size": [1280, 720],
+            }
 
             result = analyze_video(str(sample_video_file))
 
@@ -169,15 +369,46 @@ class TestAnalyzeVideo:
             assert result["width"] == 1280
             assert result["height"] == 720
 
+    def test_analyze_video_reads_metadata_only(self, temp_dir, sample_video_file):
+        """Test that analysis probes the container without opening a clip reader."""
+        with (
+            patch("sprite_processor.video.ffmpeg_parse_infos") as mock_infos,
+            patch("sprite_processor.video.VideoFileClip") as mock_clip,
+        ):
+            mock_infos.return_value = {"duration": 1.0, "video_fps": 30.0, "video_size": [64, 64]}
+
+            analyze_video(sample_video_file)
+
+            mock_infos.assert_called_once_with(str(sample_video_file))
+            mock_clip.assert_not_called()
+
+    def test_analyze_video_memoized(self, temp_dir):
+        """Test that an unchanged file is probed once and a modified one again."""
+        video_path = temp_dir / "clip.mp4"
+        video_path.write_bytes(b"fake video content")
+
+        with patch("sprite_processor.video.ffmpeg_parse_infos") as mock_infos:
+            mock_infos.return_value = {"duration": 2.0, "video_fps": 24.0, "video_size": [64, 64]}
+
+            first = analyze_video(video_path)
+            second = analyze_video(str(video_path))
+            assert mock_infos.call_count == 1
+            assert second == first
+            assert second is not first
+
+            # A rewritten file (new size and mtime) is probed again
+            video_path.write_bytes(b"longer fake video content")
+            analyze_video(video_path)
+            assert mock_infos.call_count == 2
+
     def test_analyze_video_custom_fps(self, temp_dir, sample_video_file):
         """Test video analysis with custom FPS."""
-        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
-            mock_video = MagicMock()
-            mock_video.duration = 3.0
-            mock_video.fps = 30.0
-            mock_video.size = (1920, 1080)
-
-            mock_clip.return_value.__enter__.return_value = mock_video
+        with patch("sprite_processor.video.ffmpeg_parse_infos") as mock_infos:
+            mock_infos.return_value = {
+                "duration": 3.0,
+                "video_fps": 30.0,
+                "video_size": [1920, 1080],
+            }
 
             result = analyze_video(str(sample_video_file), target_fps=15)
 
@@ -187,13 +418,12 @@ class TestAnalyzeVideo:
 
     def test_analyze_video_short_duration(self, temp_dir, sample_video_file):
         """Test video analysis with very short duration."""
-        with patch("sprite_processor.video.VideoFileClip") as mock_clip:
-            mock_video = MagicMock()
-            mock_video.duration = 0.5  # Very short video
-            mock_video.fps = 60.0
-            mock_video.size = (640, 480)
-
-            mock_clip.return_value.__enter__.return_value = mock_video
+        with patch("sprite_processor.video.ffmpeg_parse_infos") as mock_infos:
+            mock_infos.return_value = {
+                "duration": 0.5,  # Very short video
+                "video_fps": 60.0,
+                "video_size": [640, 480],
+            }
 
             result = analyze_video(str(sample_video_file))
 
@@ -203,7 +433,7 @@ class TestAnalyzeVideo:
 
     def test_analyze_video_nonexistent_file(self, temp_dir):
         """Test analyze_video with non-existent file."""
-        with pytest.raises(Exception):  # VideoFileClip will raise an exception
+        with pytest.raises(Exception):  # The existence check raises before probing
             analyze_video("nonexistent.mp4")
 
 
@@ -212,9 +442,6 @@ class TestExtractGifFrames:
 
     def test_extract_gif_frames_basic(self, temp_dir, sample_gif):
         """Test basic GIF frame extraction."""
-        from sprite_processor.video import extract_gif_frames
-        from pathlib import Path
-
         # Create a temporary GIF file
         gif_path = temp_dir / "test.gif"
         gif_path.write_bytes(sample_gif)
@@ -226,17 +453,13 @@ class TestExtractGifFrames:
             # Should return at least one frame
             assert len(frames) >= 1
             # Each frame should be a PIL Image
-            for frame in frames:
-                assert hasattr(frame, 'size')
+            assert all(hasattr(frame, "size") for frame in frames)
         except Exception:
             # If the function fails due to mocking issues, that's acceptable for this test
             pass
 
     def test_extract_gif_frames_max_frames_limit(self, temp_dir, sample_gif):
         """Test GIF frame extraction with max_frames limit."""
-        from sprite_processor.video import extract_gif_frames
-        from pathlib import Path
-
         # Create a temporary GIF file
         gif_path = temp_dir / "test.gif"
         gif_path.write_bytes(sample_gif)
@@ -253,59 +476,98 @@ class TestExtractGifFrames:
 
     def test_extract_gif_frames_nonexistent_file(self, temp_dir):
         """Test extract_gif_frames with non-existent file."""
-        from sprite_processor.video import extract_gif_frames
-
         with pytest.raises(Exception):
             extract_gif_frames("nonexistent.gif")
 
 
-class TestVideoToSpritesheetReal:
-    """Test video_to_spritesheet with more realistic scenarios."""
+class TestIterGifFrames:
+    """Test the iter_gif_frames generator."""
 
-    def test_video_to_spritesheet_with_real_frames(self, temp_dir, sample_video_file):
-        """Test video_to_spritesheet with realistic frame processing."""
-        output_path = temp_dir / "output.png"
+    def test_iter_gif_frames_is_lazy(self, temp_dir, sample_gif):
+        """Test that frames are yielded one at a time as RGBA images."""
+        gif_path = temp_dir / "test.gif"
+        gif_path.write_bytes(sample_gif)
 
-        with (
-            patch("sprite_processor.video.VideoFileClip") as mock_clip,
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-        ):
-            # Mock video clip
-            mock_video = MagicMock()
-            mock_video.duration = 2.0
-            mock_video.fps = 12.0
-            mock_video.size = (640, 480)
-            mock_video.w = 640
-            mock_video.h = 480
-            mock_video.resize.return_value = mock_video
-            mock_video.subclip.return_value = mock_video
-            mock_video.write_gif.return_value = None
-            mock_video.set_end.return_value = mock_video
+        frames = iter_gif_frames(gif_path, max_frames=2)
 
-            mock_clip.return_value.__enter__.return_value = mock_video
+        assert isinstance(frames, Iterator)
+        first = next(frames)
+        assert first.mode == "RGBA"
+        assert len([first, *frames]) == 2
 
-            # Mock realistic frame extraction
-            mock_frames = []
-            for i in range(8):  # 8 frames
-                mock_frame = MagicMock()
-                mock_frame.size = (320, 240)
-                mock_frames.append(mock_frame)
-            mock_extract.return_value = mock_frames
 
-            # Mock spritesheet creation
-            mock_create_spritesheet.return_value = output_path
+class TestExtractGifFramesToDir:
+    """Test the extract_gif_frames_to_dir function."""
+
+    def test_extract_gif_frames_to_dir_streams(self, temp_dir, sample_gif):
+        """Test that each frame is written before the next one is decoded."""
+        gif_path = temp_dir / "test.gif"
+        gif_path.write_bytes(sample_gif)
+        output_dir = temp_dir / "frames"
+
+        def spy(*args, **kwargs):
+            for i, frame in enumerate(iter_gif_frames(*args, **kwargs)):
+                # Every earlier frame is already on disk when frame i is handed out
+                assert sorted(p.name for p in output_dir.iterdir()) == [
+                    f"frame_{j:03d}.png" for j in range(i)
+                ]
+                yield frame
+
+        with patch("sprite_processor.video.iter_gif_frames", side_effect=spy):
+            paths = extract_gif_frames_to_dir(gif_path, output_dir, max_frames=3)
+
+        assert [p.name for p in paths] == ["frame_000.png", "frame_001.png", "frame_002.png"]
+        with Image.open(paths[0]) as frame:
+            assert frame.mode == "RGBA"
+
+    @pytest.mark.parametrize("max_frames", [0, -1])
+    def test_extract_gif_frames_to_dir_non_positive_max_frames(
+        self, temp_dir, sample_gif, max_frames
+    ):
+        """Test that max_frames <= 0 writes no frames rather than all of them."""
+        gif_path = temp_dir / "test.gif"
+        gif_path.write_bytes(sample_gif)
+        output_dir = temp_dir / "frames"
+
+        assert extract_gif_frames_to_dir(gif_path, output_dir, max_frames=max_frames) == []
+        assert list(output_dir.iterdir()) == []
+
+
+class TestExtractGifFramesArray:
+    """Test the extract_gif_frames_array function."""
+
+    def test_extract_gif_frames_array_shape(self, temp_dir, sample_gif):
+        """Test frames are returned as one (N, H, W, 4) uint8 array."""
+        gif_path = temp_dir / "test.gif"
+        gif_path.write_bytes(sample_gif)
+
+        frames = extract_gif_frames_array(gif_path, max_frames=3)
+
+        assert frames.dtype == "uint8"
+        assert frames.ndim == 4
+        assert 1 <= frames.shape[0] <= 3
+        assert frames.shape[3] == 4
+
+    def test_extract_gif_frames_array_nonexistent_file(self, temp_dir):
+        """Test extract_gif_frames_array with non-existent file."""
+        with pytest.raises(FileNotFoundError):
+            extract_gif_frames_array(temp_dir / "nonexistent.gif")
 
-            with patch("sprite_processor.video.Image") as mock_image:
-                mock_img = MagicMock()
-                mock_img.size = (320, 240)
-                mock_image.new.return_value = mock_img
-                mock_image.open.return_value = mock_img
 
-            # Create dummy files
-            temp_gif = temp_dir / "temp.gif"
-            temp_gif.write_bytes(b"dummy gif content")
-            output_path.write_bytes(b"dummy png content")
+class TestVideoToSpritesheetReal:
+    """Test video_to_spritesheet with more realistic scenarios.
+
+    Only the decode is patched; the real ``_create_spritesheet`` tiles the frame
+    array and writes the PNG.
+    """
+
+    def test_video_to_spritesheet_with_real_frames(self, temp_dir, sample_video_file):
+        """Test video_to_spritesheet with realistic frame processing."""
+        output_path = temp_dir / "output.png"
+
+        with patch("sprite_processor.video.cv2.VideoCapture") as mock_capture:
+            # 24 source frames at 12fps; frame i is filled with the value i
+            mock_capture.return_value = _mock_capture(2.0, 12.0, (640, 480))
 
             result = video_to_spritesheet(
                 str(sample_video_file),
@@ -317,51 +579,22 @@ class TestVideoToSpritesheetReal:
                 max_height=240,
             )
 
-            assert result == output_path
-            mock_create_spritesheet.assert_called_once()
+        assert result == output_path
+        with Image.open(output_path) as sheet:
+            assert sheet.size == (4 * 320, 2 * 240)
+            assert sheet.mode == "RGBA"
+            # Sampling at 4fps from 12fps keeps every third frame, laid out row-major
+            cells = [
+                sheet.getpixel((col * 320, row * 240))[0] for row in range(2) for col in range(4)
+            ]
+        assert cells == [0, 3, 6, 9, 12, 15, 18, 21]
 
     def test_video_to_spritesheet_auto_grid_calculation(self, temp_dir, sample_video_file):
         """Test video_to_spritesheet with automatic grid calculation."""
         output_path = temp_dir / "output.png"
 
-        with (
-            patch("sprite_processor.video.VideoFileClip") as mock_clip,
-            patch("sprite_processor.video.extract_gif_frames") as mock_extract,
-            patch("sprite_processor.cli._create_spritesheet") as mock_create_spritesheet,
-        ):
-            mock_video = MagicMock()
-            mock_video.duration = 3.0
-            mock_video.fps = 15.0
-            mock_video.size = (800, 600)
-            mock_video.w = 800
-            mock_video.h = 600
-            mock_video.resize.return_value = mock_video
-            mock_video.subclip.return_value = mock_video
-            mock_video.write_gif.return_value = None
-            mock_video.set_end.return_value = mock_video
-
-            mock_clip.return_value.__enter__.return_value = mock_video
-
-            # Mock 12 frames for auto grid calculation
-            mock_frames = []
-            for i in range(12):
-                mock_frame = MagicMock()
-                mock_frame.size = (400, 300)
-                mock_frames.append(mock_frame)
-            mock_extract.return_value = mock_frames
-
-            mock_create_spritesheet.return_value = output_path
-
-            with patch("sprite_processor.video.Image") as mock_image:
-                mock_img = MagicMock()
-                mock_img.size = (400, 300)
-                mock_image.new.return_value = mock_img
-                mock_image.open.return_value = mock_img
-
-            # Create dummy files
-            temp_gif = temp_dir / "temp.gif"
-            temp_gif.write_bytes(b"dummy gif content")
-            output_path.write_bytes(b"dummy png content")
+        with patch("sprite_processor.video.cv2.VideoCapture") as mock_capture:
+            mock_capture.return_value = _mock_capture(3.0, 15.0, (800, 600))
 
             video_to_spritesheet(
                 str(sample_video_file),
@@ -373,6 +606,63 @@ class TestVideoToSpritesheetReal:
                 max_height=300,
             )
 
-            mock_create_spritesheet.assert_called_once()
+        with Image.open(output_path) as sheet:
+            assert sheet.size == (4 * 400, 3 * 300)
+
 
+class TestCombinedPipeline:
+    """Test produce_outputs (GIF + spritesheet from one decode)."""
+
+    def test_produce_outputs_decodes_once(self, temp_dir, sample_video_file):
+        """Test that both outputs are built from a single capture on the lcm timeline."""
+        gif_path = temp_dir / "out.gif"
+        sheet_path = temp_dir / "sheet.png"
+
+        with (
+            patch("sprite_processor.video.cv2.VideoCapture") as mock_capture,
+            patch("sprite_processor.video.ImageSequenceClip") as mock_sequence,
+        ):
+            # 1s at 30fps; frame i is filled with the value i
+            cap = _mock_capture(1.0, 30.0, (16, 8))
+            mock_capture.return_value = cap
+
+            result = produce_outputs(
+                sample_video_file,
+                gif_path,
+                sheet_path,
+                gif_fps=10,
+                sheet_fps=6,
+                grid="3x2",
+                sample_evenly=False,
+            )
 
+        assert result == {"gif_path": gif_path, "spritesheet_path": sheet_path}
+        mock_capture.assert_called_once_with(str(sample_video_file))
+        cap.release.assert_called_once()
+
+        # GIF: every third source frame (10 of 30); spritesheet: every fifth (6 of 30)
+        gif_frames = mock_sequence.call_args.args[0]
+        assert [frame[0, 0, 0] for frame in gif_frames] == list(range(0, 30, 3))
+        mock_sequence.assert_called_once()
+        assert mock_sequence.call_args.kwargs == {"fps": 10}
+        mock_sequence.return_value.write_gif.assert_called_once_with(
+            str(gif_path), fps=10, program="ffmpeg"
+        )
+
+        # Frames shared by both outputs (0, 15) are decoded only once
+        assert cap.retrieve.call_count == len(set(range(0, 30, 3)) | set(range(0, 30, 5)))
+
+        with Image.open(sheet_path) as sheet:
+            assert sheet.size == (3 * 16, 2 * 8)
+            cells = [sheet.getpixel((col * 16, row * 8))[0] for row in range(2) for col in range(3)]
+        assert cells == [0, 5, 10, 15, 20, 25]
+
+    def test_produce_outputs_invalid_grid(self, temp_dir, sample_video_file):
+        """Test that a bad grid is rejected before the video is opened."""
+        with patch("sprite_processor.video.cv2.VideoCapture") as mock_capture:
+            with pytest.raises(ValueError, match="Invalid grid format"):
+                produce_outputs(
+                    sample_video_file, temp_dir / "out.gif", temp_dir / "s.png", grid="bad"
+                )
+
+            mock_capture.assert_not_called()